@@ -1,25 +1,182 @@
 import streamlit as st
 import sqlite3
 from datetime import datetime, date, time, timedelta
+from time import monotonic, sleep
 import pandas as pd
+import numpy as np
 import uuid
+from collections import OrderedDict
 from typing import List, Tuple
 import calendar as cal
 import html
+import hashlib
+import os
+import json
+import queue
+import shutil
+import threading
+import contextvars
+import hmac
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+DB_PATH = 'barber_shop.db'  # database of the default shop
+DEFAULT_TENANT = 'main'
+TENANTS_FILE = os.environ.get('BARBER_TENANTS_FILE', 'tenants.json')
+CATALOG_FILE = os.environ.get('BARBER_CATALOG_FILE', 'service_catalog.json')
+POOL_SIZE = 4
+TENANT_CACHE_SIZE = 512  # entries per shop (service lists, day availability, the price list)
+BUSY_TIMEOUT_SEC = 5.0
+
+# Shared service catalog template used to seed every new shop
+SERVICE_CATALOG = [
+    ("Men's Haircut", 30, 100.0),
+    ("Kids' Haircut (under 15)", 25, 75.0),
+    ("Seniors' Cut", 25, 75.0),
+    ("Beard Trim", 20, 50.0),
+    ("Shave Normal", 15, 25.0),
+    ("Hair color / Dry", 30, 25.0),
+    ("Haircut + hair color/Dry", 45, 125.0),
+    ("Haircut + Beard Trim", 45, 150.0),
+    ("Haircut + Shave + hair color/Dry", 60, 175.0),
+]
+DEFAULT_BARBERS = ["Alex", "Sam", "Jordan"]
+
+# -----------------------------
+# Tenancy (one SQLite file per shop)
+# -----------------------------
+
+class PooledConnection(sqlite3.Connection):
+    # close() hands the connection back to its tenant's pool instead of closing it
+    pool = None
+
+    def close(self):
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   timeout=BUSY_TIMEOUT_SEC, factory=PooledConnection)
+            conn.pool = self
+            return conn
+
+    def release(self, conn: sqlite3.Connection) -> bool:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+            return True
+        except (queue.Full, sqlite3.Error):
+            return False
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.pool = None
+            conn.close()
+
+
+class Tenant:
+    def __init__(self, slug: str, db_path: str, display_name: str = None, barbers: List[str] = None):
+        self.slug = slug
+        self.db_path = db_path
+        self.display_name = display_name or "The Groom Room"
+        self.barbers = barbers or DEFAULT_BARBERS
+        self.pool = ConnectionPool(db_path)
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.schema_version = 0
+        self.backup_status = {}
+        self.prefetched = {}  # cache keys warmed in the background and not read yet
+        self.prefetch_pending = set()
+        self.prefetch_stats = {'months': 0, 'entries': 0, 'hits': 0, 'wasted': 0}
+        self.feed_secret = None
+
+
+@st.cache_resource
+def _tenant_registry() -> Tuple[dict, threading.Lock]:
+    # Survives Streamlit reruns, so pools and caches are per process, not per run
+    return {}, threading.Lock()
+
+
+_current_tenant = contextvars.ContextVar('current_tenant', default=DEFAULT_TENANT)
+
+
+def load_tenant_config() -> dict:
+    # tenants.json: {"<slug>": {"db_path": "...", "name": "...", "barbers": [...]}, ...}
+    config = {DEFAULT_TENANT: {'db_path': DB_PATH}}
+    if os.path.exists(TENANTS_FILE):
+        with open(TENANTS_FILE, encoding='utf-8') as f:
+            config.update(json.load(f))
+    return config
+
+
+@st.cache_resource
+def load_service_catalog() -> Tuple[Tuple[str, int, float], ...]:
+    # Read-mostly data shared by all shops in the process
+    if os.path.exists(CATALOG_FILE):
+        with open(CATALOG_FILE, encoding='utf-8') as f:
+            return tuple((s['name'], int(s['duration_min']), float(s['price'])) for s in json.load(f))
+    return tuple(SERVICE_CATALOG)
+
+
+def register_tenant(slug: str, db_path: str, display_name: str = None, barbers: List[str] = None) -> Tenant:
+    tenants, lock = _tenant_registry()
+    with lock:
+        tenant = tenants.get(slug)
+        if tenant is None or tenant.db_path != db_path:
+            if tenant is not None:
+                tenant.pool.close_all()
+            tenant = tenants[slug] = Tenant(slug, db_path, display_name, barbers)
+        return tenant
+
+
+def get_tenant(slug: str = None) -> Tenant:
+    slug = slug or _current_tenant.get()
+    tenant = _tenant_registry()[0].get(slug)
+    if tenant is None:
+        cfg = load_tenant_config().get(slug)
+        if cfg is None:
+            raise KeyError(f"Unknown shop: {slug}")
+        tenant = register_tenant(slug, cfg['db_path'], cfg.get('name'), cfg.get('barbers'))
+    return tenant
+
+
+def use_tenant(slug: str) -> Tenant:
+    # Route this thread's (or Streamlit session run's) DB access to the given shop
+    tenant = get_tenant(slug)
+    _current_tenant.set(slug)
+    init_db(tenant)
+    return tenant
 
-DB_PATH = 'barber_shop.db'
 
 # -----------------------------
 # Database Helpers
 # -----------------------------
 
 def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    return get_tenant().pool.acquire()
 
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+def _migrate_base_schema(cur, tenant: Tenant):
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS barbers (
@@ -87,29 +244,275 @@ def init_db():
     # Seed basic data if empty
     cur.execute("SELECT COUNT(*) FROM barbers")
     if cur.fetchone()[0] == 0:
-        barbers = [(str(uuid.uuid4()), n) for n in ["Alex", "Sam", "Jordan"]]
+        barbers = [(str(uuid.uuid4()), n) for n in tenant.barbers]
         cur.executemany("INSERT INTO barbers (id, name) VALUES (?, ?)", barbers)
 
     cur.execute("SELECT COUNT(*) FROM services")
     if cur.fetchone()[0] == 0:
-        services = [
-            (str(uuid.uuid4()), "Men's Haircut", 30, 100.0),
-            (str(uuid.uuid4()), "Kids' Haircut (under 15)", 25, 75.0),
-            (str(uuid.uuid4()), "Seniors' Cut", 25, 75.0),
-            (str(uuid.uuid4()), "Beard Trim", 20, 50.0),
-            (str(uuid.uuid4()), "Shave Normal", 15, 25.0),
-            (str(uuid.uuid4()), "Hair color / Dry", 30, 25.0),
-            (str(uuid.uuid4()), "Haircut + hair color/Dry", 45, 125.0),
-            (str(uuid.uuid4()), "Haircut + Beard Trim", 45, 150.0),
-            (str(uuid.uuid4()), "Haircut + Shave + hair color/Dry", 60, 175.0),
-        ]
+        services = [(str(uuid.uuid4()), name, dur, price) for name, dur, price in load_service_catalog()]
         cur.executemany(
             "INSERT INTO services (id, name, duration_min, price) VALUES (?, ?, ?, ?)",
             services,
         )
 
-    conn.commit()
+
+VERSIONED_TABLES = ['barbers', 'services', 'appointments', 'waitlist', 'barber_unavailability']
+
+
+def _migrate_data_version(cur, tenant: Tenant):
+    # Lookup indexes plus a data_version counter bumped by triggers on every write,
+    # so per-tenant caches can tell when they are stale with one cheap read.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_appointments_barber_date ON appointments(barber_id, appt_date, start_time)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(appt_date, start_time)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_unavailability_barber_date ON barber_unavailability(barber_id, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_date ON waitlist(requested_date, created_at)")
+    cur.execute("CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    cur.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('data_version', 0)")
+    for table in VERSIONED_TABLES:
+        for op in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS bump_version_{table}_{op.lower()} AFTER {op} ON {table}
+                BEGIN
+                    UPDATE app_meta SET value = value + 1 WHERE key = 'data_version';
+                END;
+                """
+            )
+
+
+def _journal_json(ref: str, cols: List[str]) -> str:
+    return 'json_object(' + ', '.join(f"'{c}', {ref}.{c}" for c in cols) + ')'
+
+
+def _create_journal_triggers(cur):
+    # Drops and recreates the row-image triggers from the live column lists.
+    # INSERT keeps the new row, DELETE the old one, UPDATE only the fields that changed
+    # (before in old_json, after in row_json); updates that change nothing are skipped.
+    changed = (
+        "(SELECT json_group_object(a.key, a.value) FROM json_each({}) a JOIN json_each({}) b USING (key)"
+        " WHERE a.value IS NOT b.value)"
+    )
+    for table in VERSIONED_TABLES:
+        cols = [r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()]
+        old_row, new_row = _journal_json('OLD', cols), _journal_json('NEW', cols)
+        images = {
+            'INSERT': ('NEW', 'NULL', new_row, ''),
+            'UPDATE': ('NEW', changed.format(old_row, new_row), changed.format(new_row, old_row),
+                       f" AND {old_row} IS NOT {new_row}"),
+            'DELETE': ('OLD', old_row, 'NULL', ''),
+        }
+        for op, (ref, before, after, guard) in images.items():
+            name = f"journal_{table}_{op.lower()}"
+            cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cur.execute(
+                f"""
+                CREATE TRIGGER {name} AFTER {op} ON {table}
+                WHEN (SELECT value FROM app_meta WHERE key = 'journal_paused') = 0{guard}
+                BEGIN
+                    INSERT INTO write_journal (ts, table_name, op, row_id, row_json, old_json)
+                    VALUES (strftime('%Y-%m-%dT%H:%M:%f', 'now'), '{table}', '{op}', {ref}.id, {after}, {before});
+                END;
+                """
+            )
+
+
+def _migrate_write_journal(cur, tenant: Tenant):
+    # Every write is journaled in its own transaction, so a snapshot plus the
+    # journal rows after it can roll a shop forward to any point in time.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS write_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL,          -- UTC, YYYY-MM-DDTHH:MM:SS.SSS
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,          -- INSERT / UPDATE / DELETE
+            row_id TEXT NOT NULL,
+            row_json TEXT              -- full row after the write, NULL for DELETE
+        );
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_write_journal_ts ON write_journal(ts)")
+    cur.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('journal_paused', 0)")
+    # Triggers as first shipped (full row after the write); frozen, since migrations
+    # must build the same schema forever. _migrate_event_journal replaces them.
+    for table in VERSIONED_TABLES:
+        cols = [r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()]
+        for op, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            name = f"journal_{table}_{op.lower()}"
+            row_json = 'NULL' if op == 'DELETE' else 'json_object(' + ', '.join(f"'{c}', NEW.{c}" for c in cols) + ')'
+            cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cur.execute(
+                f"""
+                CREATE TRIGGER {name} AFTER {op} ON {table}
+                WHEN (SELECT value FROM app_meta WHERE key = 'journal_paused') = 0
+                BEGIN
+                    INSERT INTO write_journal (ts, table_name, op, row_id, row_json)
+                    VALUES (strftime('%Y-%m-%dT%H:%M:%f', 'now'), '{table}', '{op}', {ref}.id, {row_json});
+                END;
+                """
+            )
+
+
+def _migrate_submission_keys(cur, tenant: Tenant):
+    # Idempotency keys of accepted form submissions, plus the waitlist
+    # (phone, date) index used to spot repeat sign-ups
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS submission_keys (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,        -- booking / waitlist
+            entity_id TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_submission_keys_created ON submission_keys(created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_phone_date ON waitlist(phone, requested_date)")
+
+
+def _migrate_event_journal(cur, tenant: Tenant):
+    # Before-images for the journal, plus a baseline INSERT event per existing row so
+    # the events after journal_base_seq rebuild the shop from an empty schema.
+    # journal_floor is the highest seq pruned (or invalidated by a restore); a
+    # consumer whose cursor is behind it has missed events and must rescan.
+    cols = [r[1] for r in cur.execute("PRAGMA table_info(write_journal)").fetchall()]
+    if 'old_json' not in cols:
+        cur.execute("ALTER TABLE write_journal ADD COLUMN old_json TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_write_journal_table ON write_journal(table_name, seq)")
+    _create_journal_triggers(cur)  # replaces migration 3's triggers now that old_json exists
+    seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name='write_journal'").fetchone()
+    seq = seq[0] if seq else 0
+    first = cur.execute("SELECT MIN(seq) FROM write_journal").fetchone()[0]
+    cur.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('journal_base_seq', ?)", (seq,))
+    cur.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('journal_floor', ?)",
+                (seq if first is None else first - 1,))
+    for table in VERSIONED_TABLES:
+        cols = [r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()]
+        cur.execute(
+            f"""
+            INSERT INTO write_journal (ts, table_name, op, row_id, row_json)
+            SELECT strftime('%Y-%m-%dT%H:%M:%f', 'now'), '{table}', 'INSERT', id, {_journal_json(table, cols)}
+            FROM {table} ORDER BY rowid
+            """
+        )
+
+
+def _migrate_slot_holds(cur, tenant: Tenant):
+    # Short-lived reservations of a slot while a customer fills in the form, one per session.
+    # Not versioned or journaled: they expire on their own and never invalidate caches.
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS slot_holds (
+            session_id TEXT PRIMARY KEY,
+            barber_id TEXT NOT NULL,
+            hold_date TEXT NOT NULL,   -- YYYY-MM-DD
+            start_time TEXT NOT NULL,  -- HH:MM
+            end_time TEXT NOT NULL,    -- HH:MM
+            expires_at TEXT NOT NULL   -- UTC ISO timestamp
+        );
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_barber_date ON slot_holds(barber_id, hold_date, start_time)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_expires ON slot_holds(expires_at)")
+    for key in HOLD_METRICS:
+        cur.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES (?, 0)", (key,))
+
+
+def _migrate_feeds(cur, tenant: Tenant):
+    # data_modified (unix time) follows every data_version move, for Last-Modified headers;
+    # app_settings holds the secret that calendar feed tokens are derived from
+    cur.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('data_modified', CAST(strftime('%s', 'now') AS INTEGER))")
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS touch_data_modified AFTER UPDATE OF value ON app_meta
+        WHEN NEW.key = 'data_version'
+        BEGIN
+            UPDATE app_meta SET value = CAST(strftime('%s', 'now') AS INTEGER) WHERE key = 'data_modified';
+        END;
+        """
+    )
+    cur.execute("CREATE TABLE IF NOT EXISTS app_settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    cur.execute("INSERT OR IGNORE INTO app_settings (key, value) VALUES ('feed_secret', ?)", (secrets.token_hex(16),))
+
+
+# Applied in order; PRAGMA user_version records how many have run for a shop's DB
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_data_version,
+    _migrate_write_journal,
+    _migrate_submission_keys,
+    _migrate_event_journal,
+    _migrate_slot_holds,
+    _migrate_feeds,
+]
+
+
+def _run_migrations(conn: sqlite3.Connection, tenant: Tenant):
+    conn.isolation_level = None
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for step in MIGRATIONS[version:]:
+            step(cur, tenant)
+        cur.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+
+
+def init_db(tenant: Tenant = None):
+    tenant = tenant or get_tenant()
+    if tenant.schema_version == len(MIGRATIONS):
+        return
+    with tenant.lock:
+        if tenant.schema_version == len(MIGRATIONS):
+            return
+        conn = sqlite3.connect(tenant.db_path, timeout=BUSY_TIMEOUT_SEC)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _run_migrations(conn, tenant)
+        finally:
+            conn.close()
+        tenant.schema_version = len(MIGRATIONS)
+
+
+def get_data_version() -> int:
+    conn = get_conn()
+    row = conn.execute("SELECT value FROM app_meta WHERE key='data_version'").fetchone()
     conn.close()
+    return row[0] if row else 0
+
+
+def tenant_cached(key, loader, version: int = None, prefetch: bool = False):
+    # Per-tenant LRU memo; an entry is stale as soon as the shop's data version moves.
+    # Entries loaded by a prefetch count as hits when first read, and as wasted work
+    # if they go stale or are evicted before anyone reads them.
+    tenant = get_tenant()
+    version = get_data_version() if version is None else version
+    stats = tenant.prefetch_stats
+    with tenant.cache_lock:
+        hit = tenant.cache.get(key)
+        if hit is not None and hit[0] == version:
+            tenant.cache.move_to_end(key)
+            if not prefetch and tenant.prefetched.pop(key, None) is not None:
+                stats['hits'] += 1
+            return hit[1]
+        if tenant.prefetched.pop(key, None) is not None:
+            stats['wasted'] += 1
+    value = loader()
+    with tenant.cache_lock:
+        tenant.cache[key] = (version, value)
+        tenant.cache.move_to_end(key)
+        if prefetch:
+            tenant.prefetched[key] = version
+            stats['entries'] += 1
+        while len(tenant.cache) > TENANT_CACHE_SIZE:
+            evicted, _ = tenant.cache.popitem(last=False)
+            if tenant.prefetched.pop(evicted, None) is not None:
+                stats['wasted'] += 1
+    return value
 
 
 def fetch_df(query: str, params: Tuple = ()):  
@@ -120,11 +523,11 @@ def fetch_df(query: str, params: Tuple = ()):
 
 
 def get_barbers():
-    return fetch_df("SELECT id, name FROM barbers ORDER BY name")
+    return tenant_cached('barbers', lambda: fetch_df("SELECT id, name FROM barbers ORDER BY name"))
 
 
 def get_services():
-    return fetch_df("SELECT id, name, duration_min, price FROM services ORDER BY name")
+    return tenant_cached('services', lambda: fetch_df("SELECT id, name, duration_min, price FROM services ORDER BY name"))
 
 
 def get_appointments_for_barber(barber_id: str, on_date: date):
@@ -142,41 +545,292 @@ def get_appointments_for_barber(barber_id: str, on_date: date):
 
 
 def create_appointment(barber_id: str, service_id: str, customer_name: str, customer_phone: str,
-                        appt_date: date, start_time: time, notes: str="") -> str:
+                        appt_date: date, start_time: time, notes: str="", idempotency_key: str = None,
+                        session_id: str = None) -> str:
+    if idempotency_key:
+        existing = lookup_submission(idempotency_key)
+        if existing:
+            return existing
     # Compute end time from service duration
     services = get_services()
     duration = int(services.loc[services['id'] == service_id, 'duration_min'].iloc[0])
     end_dt = datetime.combine(appt_date, start_time) + timedelta(minutes=duration)
     end_time = end_dt.time()
 
-    # Check conflict
-    if has_conflict(barber_id, appt_date, start_time, end_time):
-        raise ValueError("This time slot is no longer available. Please pick another.")
-
     appt_id = str(uuid.uuid4())
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute(
+    # Conflict check, insert and hold release in one write transaction, so two
+    # customers confirming the same slot can't both get it
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        if idempotency_key:
+            existing = _live_submission(cur, idempotency_key)
+            if existing:
+                # A concurrent duplicate of this submission got there first
+                conn.rollback()
+                return existing
+            # The key may outlive its appointment (cancelled since); book again under it
+            cur.execute("DELETE FROM submission_keys WHERE key=?", (idempotency_key,))
+        if _slot_taken(cur, barber_id, appt_date, start_time, end_time, session_id):
+            _bump_meta(cur, 'confirm_failed')
+            conn.commit()
+            raise ValueError("This time slot is no longer available. Please pick another.")
+        cur.execute(
+            """
+            INSERT INTO appointments (id, barber_id, service_id, customer_name, customer_phone, appt_date, start_time, end_time, notes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                appt_id,
+                barber_id,
+                service_id,
+                customer_name.strip(),
+                customer_phone.strip(),
+                appt_date.isoformat(),
+                start_time.strftime('%H:%M'),
+                end_time.strftime('%H:%M'),
+                notes.strip(),
+                datetime.utcnow().isoformat(),
+            ),
+        )
+        if session_id:
+            held = cur.execute("SELECT barber_id=? AND hold_date=? AND start_time=? FROM slot_holds WHERE session_id=? AND expires_at > ?",
+                               (barber_id, appt_date.isoformat(), start_time.strftime('%H:%M'), session_id,
+                                datetime.utcnow().isoformat())).fetchone()
+            if held is not None:
+                cur.execute("DELETE FROM slot_holds WHERE session_id=?", (session_id,))
+                _bump_meta(cur, 'holds_converted' if held[0] else 'holds_released')
+        if idempotency_key:
+            _record_submission(cur, idempotency_key, 'booking', appt_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return appt_id
+
+
+SUBMISSION_KEY_TTL_HOURS = 24
+
+
+def make_idempotency_key(nonce: str, kind: str, *parts) -> str:
+    # Same session + same form contents -> same key, so double taps and retries collapse
+    return hashlib.sha256('\x1f'.join([nonce, kind, *map(str, parts)]).encode()).hexdigest()
+
+
+def _live_submission(cur, key: str) -> str:
+    # The entity a key was recorded for, unless that row has since been deleted
+    row = cur.execute(
         """
-        INSERT INTO appointments (id, barber_id, service_id, customer_name, customer_phone, appt_date, start_time, end_time, notes, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        SELECT s.entity_id FROM submission_keys s
+        WHERE s.key=? AND EXISTS (
+            SELECT 1 FROM appointments a WHERE s.kind='booking' AND a.id=s.entity_id
+            UNION ALL
+            SELECT 1 FROM waitlist w WHERE s.kind='waitlist' AND w.id=s.entity_id)
         """,
-        (
-            appt_id,
-            barber_id,
-            service_id,
-            customer_name.strip(),
-            customer_phone.strip(),
-            appt_date.isoformat(),
-            start_time.strftime('%H:%M'),
-            end_time.strftime('%H:%M'),
-            notes.strip(),
-            datetime.utcnow().isoformat(),
-        ),
-    )
+        (key,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def lookup_submission(key: str) -> str:
+    conn = get_conn()
+    existing = _live_submission(conn.cursor(), key)
+    conn.close()
+    return existing
+
+
+def _record_submission(cur, key: str, kind: str, entity_id: str):
+    now = datetime.utcnow()
+    cur.execute("DELETE FROM submission_keys WHERE created_at < ?",
+                ((now - timedelta(hours=SUBMISSION_KEY_TTL_HOURS)).isoformat(),))
+    cur.execute("INSERT INTO submission_keys (key, kind, entity_id, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, entity_id, now.isoformat()))
+
+
+def add_to_waitlist(name: str, phone: str, notes: str, requested_date: date, idempotency_key: str = None) -> Tuple[str, bool]:
+    # Returns (waitlist id, created). A phone already waiting for that date gets its existing entry back.
+    if idempotency_key:
+        existing = lookup_submission(idempotency_key)
+        if existing:
+            return existing, False
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        if idempotency_key:
+            existing = _live_submission(cur, idempotency_key)
+            if existing:
+                conn.rollback()
+                return existing, False
+            cur.execute("DELETE FROM submission_keys WHERE key=?", (idempotency_key,))
+        row = cur.execute("SELECT id FROM waitlist WHERE phone=? AND requested_date=? LIMIT 1",
+                          (phone.strip(), requested_date.isoformat())).fetchone()
+        if row:
+            conn.rollback()
+            return row[0], False
+        entry_id = str(uuid.uuid4())
+        cur.execute('''INSERT INTO waitlist (id, name, phone, notes, requested_date, created_at) VALUES (?, ?, ?, ?, ?, ?)''',
+                    (entry_id, name.strip(), phone.strip(), notes.strip(), requested_date.isoformat(), datetime.utcnow().isoformat()))
+        if idempotency_key:
+            _record_submission(cur, idempotency_key, 'waitlist', entry_id)
+        conn.commit()
+        return entry_id, True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+class TokenBucketLimiter:
+    # In-memory token buckets keyed by phone / IP; least recently seen keys are evicted past max_keys
+    def __init__(self, capacity: float, refill_per_sec: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def allow(self, key: str, cost: float = 1.0, now: float = None) -> bool:
+        now = monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_sec)
+            allowed = tokens >= cost
+            self._buckets[key] = (tokens - cost if allowed else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+
+SUBMIT_LIMIT_PER_PHONE = (3, 1 / 120)  # burst of 3, then one every 2 minutes
+# Per client address. Kept far above the per-phone limit: behind shop Wi-Fi, carrier NAT or
+# a proxy, many customers share one address. A burst of 0 turns the IP limit off.
+SUBMIT_LIMIT_PER_IP = (int(os.environ.get('BARBER_SUBMIT_IP_BURST', '60')),
+                       float(os.environ.get('BARBER_SUBMIT_IP_PER_MIN', '30')) / 60)
+# Reverse proxies whose X-Forwarded-For is believed, e.g. "127.0.0.1,10.0.0.2"
+TRUSTED_PROXIES = frozenset(ip.strip() for ip in os.environ.get('BARBER_TRUSTED_PROXIES', '').split(',') if ip.strip())
+
+
+@st.cache_resource
+def _submission_limiters() -> dict:
+    return {'phone': TokenBucketLimiter(*SUBMIT_LIMIT_PER_PHONE), 'ip': TokenBucketLimiter(*SUBMIT_LIMIT_PER_IP)}
+
+
+def forwarded_client(peer: str, forwarded_for: str = None) -> str:
+    # The address to rate-limit: the peer itself, or when the peer is a trusted proxy,
+    # the nearest X-Forwarded-For hop that is not one of our proxies
+    if peer not in TRUSTED_PROXIES or not forwarded_for:
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    untrusted = [hop for hop in hops if hop not in TRUSTED_PROXIES]
+    return untrusted[-1] if untrusted else peer
+
+
+def allow_submission(phone: str, ip: str = None, now: float = None) -> bool:
+    limiters = _submission_limiters()
+    slug = get_tenant().slug
+    if ip and SUBMIT_LIMIT_PER_IP[0] > 0 and not limiters['ip'].allow(f"{slug}:{ip}", now=now):
+        return False
+    return limiters['phone'].allow(f"{slug}:{phone}", now=now)
+
+
+SLOT_HOLD_TTL_MIN = 5
+HOLD_METRICS = ['holds_placed', 'holds_refused', 'holds_released', 'holds_expired', 'holds_converted', 'confirm_failed']
+
+
+def _bump_meta(cur, key: str, n: int = 1):
+    cur.execute("UPDATE app_meta SET value = value + ? WHERE key = ?", (n, key))
+
+
+def _sweep_holds(cur, now: datetime) -> int:
+    # Expired holds are ignored by every reader anyway; this just keeps the table small
+    expired = cur.execute("DELETE FROM slot_holds WHERE expires_at <= ?", (now.isoformat(),)).rowcount
+    if expired:
+        _bump_meta(cur, 'holds_expired', expired)
+    return expired
+
+
+def _slot_taken(cur, barber_id: str, d: date, start: time, end: time, session_id: str = None) -> bool:
+    # Overlaps a booking, or a live hold of another session (HH:MM strings compare in time order)
+    args = (barber_id, d.isoformat(), end.strftime('%H:%M'), start.strftime('%H:%M'))
+    return cur.execute(
+        """
+        SELECT 1 FROM appointments WHERE barber_id=? AND appt_date=? AND start_time < ? AND end_time > ?
+        UNION ALL
+        SELECT 1 FROM slot_holds WHERE barber_id=? AND hold_date=? AND start_time < ? AND end_time > ?
+            AND expires_at > ? AND session_id IS NOT ?
+        LIMIT 1
+        """,
+        (*args, *args, datetime.utcnow().isoformat(), session_id),
+    ).fetchone() is not None
+
+
+def hold_slot(session_id: str, barber_id: str, service_id: str, d: date, start: time) -> datetime:
+    # Reserve a slot for this session for SLOT_HOLD_TTL_MIN minutes, replacing any hold it
+    # already had. Returns the expiry (UTC), or None if the slot is booked or held by someone else.
+    services = get_services()
+    duration = int(services.loc[services['id'] == service_id, 'duration_min'].iloc[0])
+    end = (datetime.combine(d, start) + timedelta(minutes=duration)).time()
+    now = datetime.utcnow()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        _sweep_holds(cur, now)
+        if _slot_taken(cur, barber_id, d, start, end, session_id):
+            _bump_meta(cur, 'holds_refused')
+            conn.commit()
+            return None
+        expires = now + timedelta(minutes=SLOT_HOLD_TTL_MIN)
+        cur.execute("INSERT OR REPLACE INTO slot_holds (session_id, barber_id, hold_date, start_time, end_time, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, barber_id, d.isoformat(), start.strftime('%H:%M'), end.strftime('%H:%M'), expires.isoformat()))
+        _bump_meta(cur, 'holds_placed')
+        conn.commit()
+        return expires
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def release_hold(session_id: str):
+    conn = get_conn()
+    if conn.execute("DELETE FROM slot_holds WHERE session_id=? AND expires_at > ?",
+                    (session_id, datetime.utcnow().isoformat())).rowcount:
+        _bump_meta(conn, 'holds_released')
     conn.commit()
     conn.close()
-    return appt_id
+
+
+def active_holds(barber_ids: List[str], first: date, last: date, session_id: str = None) -> dict:
+    # Live holds of other sessions as {(barber_id, 'YYYY-MM-DD'): [(start_min, end_min), ...]}
+    marks = ','.join('?' for _ in barber_ids)
+    conn = get_conn()
+    rows = conn.execute(
+        f"SELECT barber_id, hold_date, start_time, end_time FROM slot_holds "
+        f"WHERE barber_id IN ({marks}) AND hold_date BETWEEN ? AND ? AND expires_at > ? AND session_id IS NOT ? "
+        f"ORDER BY barber_id, hold_date, start_time",
+        (*barber_ids, first.isoformat(), last.isoformat(), datetime.utcnow().isoformat(), session_id),
+    ).fetchall()
+    conn.close()
+    holds = {}
+    for b_id, d_str, start_str, end_str in rows:
+        holds.setdefault((b_id, d_str), []).append((_to_min(start_str), _to_min(end_str)))
+    return holds
+
+
+def hold_metrics() -> dict:
+    conn = get_conn()
+    marks = ','.join('?' for _ in HOLD_METRICS)
+    metrics = dict(conn.execute(f"SELECT key, value FROM app_meta WHERE key IN ({marks})", HOLD_METRICS).fetchall())
+    conn.close()
+    return metrics
 
 
 def delete_appointment(appt_id: str):
@@ -226,6 +880,662 @@ def is_barber_unavailable(barber_id: str, d: date, start: time, end: time) -> bo
     return False
 
 
+OVERLAP_SQL = """
+    SELECT a.appt_date, a.barber_id, a.id AS appt_id, a.start_time, a.end_time, a.customer_name,
+           b.id AS other_id, b.start_time AS other_start, b.end_time AS other_end, b.customer_name AS other_name
+    FROM appointments a
+    JOIN appointments b ON b.barber_id = a.barber_id AND b.appt_date = a.appt_date AND b.id != a.id
+         AND a.start_time < b.end_time AND b.start_time < a.end_time
+    WHERE a.service_id IN ({marks}) AND (a.appt_date > ? OR (a.appt_date = ? AND a.start_time >= ?))
+"""
+
+
+def save_services(original: pd.DataFrame, edited: pd.DataFrame, now: datetime = None) -> Tuple[int, int, pd.DataFrame]:
+    # Write only the rows that changed, in one transaction. When a duration changes,
+    # future bookings of that service get their end_time recomputed by a single
+    # set-based UPDATE, and any overlaps that creates are returned for the admin.
+    now = now or datetime.now()
+    cols = ['name', 'duration_min', 'price']
+    edited = edited[cols].set_axis(original.index)
+    changed = original[(original[cols] != edited).any(axis=1)].index
+    if changed.empty:
+        return 0, 0, pd.DataFrame()
+    updates = edited.loc[changed].assign(id=original.loc[changed, 'id'])
+    # A cleared cell comes back as NaN/None; refuse the whole save rather than write half of it
+    bad = ((updates['name'].fillna('').astype(str).str.strip() == '')
+           | ~(pd.to_numeric(updates['duration_min'], errors='coerce') > 0)
+           | ~(pd.to_numeric(updates['price'], errors='coerce') > 0))
+    if bad.any():
+        raise ValueError("Every service needs a name, and a duration and price above zero. Check: "
+                         + ', '.join(original.loc[bad[bad].index, 'name']))
+    updates['duration_min'] = updates['duration_min'].astype(int)
+    updates['price'] = updates['price'].astype(float)
+    retime_ids = list(original.loc[changed][original.loc[changed, 'duration_min'] != updates['duration_min']]['id'])
+
+    marks = ','.join('?' for _ in retime_ids)
+    future = (now.date().isoformat(), now.date().isoformat(), now.strftime('%H:%M'))
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = pd.read_sql_query(OVERLAP_SQL.format(marks=marks), conn, params=(*retime_ids, *future)) if retime_ids else None
+        conn.executemany("UPDATE services SET name=?, duration_min=?, price=? WHERE id=?",
+                         updates[cols + ['id']].itertuples(index=False, name=None))
+        retimed = 0
+        if retime_ids:
+            retimed = conn.execute(
+                f"""
+                UPDATE appointments
+                SET end_time = strftime('%H:%M', start_time,
+                                        '+' || (SELECT duration_min FROM services s WHERE s.id = appointments.service_id) || ' minutes')
+                WHERE service_id IN ({marks}) AND (appt_date > ? OR (appt_date = ? AND start_time >= ?))
+                """,
+                (*retime_ids, *future),
+            ).rowcount
+            after = pd.read_sql_query(OVERLAP_SQL.format(marks=marks), conn, params=(*retime_ids, *future))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if not retime_ids:
+        return len(changed), 0, pd.DataFrame()
+    # Only report pairs that did not already overlap before the change
+    seen = set(zip(before['appt_id'], before['other_id']))
+    new_overlaps = after[[pair not in seen for pair in zip(after['appt_id'], after['other_id'])]]
+    # A pair of two re-timed bookings shows up once from each side
+    pair_key = pd.Series([tuple(sorted(p)) for p in zip(new_overlaps['appt_id'], new_overlaps['other_id'])], index=new_overlaps.index)
+    return len(changed), retimed, new_overlaps[~pair_key.duplicated()].reset_index(drop=True)
+
+
+# -----------------------------
+# Backup & Restore
+# -----------------------------
+
+BACKUP_DIR = os.environ.get('BARBER_BACKUP_DIR', 'backups')
+BACKUP_KEEP = int(os.environ.get('BARBER_BACKUP_KEEP', '7'))
+BACKUP_INTERVAL_MIN = int(os.environ.get('BARBER_BACKUP_INTERVAL_MIN', '60'))  # 0 disables the scheduler
+# Backup rotation is what prunes the write journal. With the scheduler off, journal rows
+# older than this many days are pruned instead (0 keeps them forever).
+JOURNAL_KEEP_DAYS = int(os.environ.get('BARBER_JOURNAL_KEEP_DAYS', '30'))
+BACKUP_PAGES_PER_STEP = 64
+BACKUP_STEP_SLEEP_SEC = 0.005
+JOURNAL_PRUNE_BATCH = 500
+JOURNAL_PRUNE_PAUSE_SEC = 0.05
+
+
+def _journal_seq(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='write_journal'").fetchone()
+    return row[0] if row else 0
+
+
+def backup_tenant(tenant: Tenant = None, rotate: bool = True) -> str:
+    # Online copy via the SQLite backup API in small page steps, all taken from
+    # one WAL read snapshot: the copy is consistent without restarting when
+    # bookings land mid-copy, and in WAL mode a reader never blocks writers.
+    tenant = tenant or get_tenant()
+    init_db(tenant)
+    folder = os.path.join(BACKUP_DIR, tenant.slug)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{tenant.slug}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}.db")
+    tmp_path = path + '.part'
+    status = {'state': 'running', 'started': datetime.utcnow(), 'pages_done': 0, 'pages_total': 0}
+    tenant.backup_status = status
+
+    def progress(_rc, remaining, total):
+        status['pages_total'] = total
+        status['pages_done'] = total - remaining
+
+    src = sqlite3.connect(tenant.db_path, timeout=BUSY_TIMEOUT_SEC, isolation_level=None)
+    dst = sqlite3.connect(tmp_path)
+    t0 = datetime.utcnow()
+    try:
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # starts the read snapshot
+        src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP_SEC)
+        src.execute("COMMIT")
+        dst.execute("PRAGMA journal_mode=DELETE")  # a self-contained file, not WAL like the source
+        status['journal_seq'] = _journal_seq(dst)
+        dst.close()
+        os.replace(tmp_path, path)
+    except Exception as ex:
+        dst.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        status.update(state='failed', error=str(ex), duration=(datetime.utcnow() - t0).total_seconds())
+        raise
+    finally:
+        src.close()
+    status.update(state='done', path=path, size=os.path.getsize(path),
+                  duration=(datetime.utcnow() - t0).total_seconds())
+    if rotate:
+        rotate_backups(tenant)
+    return path
+
+
+def list_backups(tenant: Tenant = None) -> List[str]:
+    tenant = tenant or get_tenant()
+    folder = os.path.join(BACKUP_DIR, tenant.slug)
+    if not os.path.isdir(folder):
+        return []
+    names = [n for n in os.listdir(folder) if n.startswith(f"{tenant.slug}-") and n.endswith('.db')]
+    return [os.path.join(folder, n) for n in sorted(names, reverse=True)]
+
+
+def rotate_backups(tenant: Tenant, keep: int = BACKUP_KEEP):
+    # Drop old snapshots, then the journal rows no remaining snapshot needs. The shop is
+    # always explicit: the scheduler thread has no current shop, and falling back to the
+    # default one would prune its journal against another shop's snapshots.
+    snapshots = list_backups(tenant)
+    for old in snapshots[keep:]:
+        os.remove(old)
+    kept = snapshots[:keep]
+    if not kept:
+        return
+    prune_journal(tenant, _snapshot_seq(kept[-1]))
+
+
+def prune_journal(tenant: Tenant, upto_seq: int):
+    # Delete journal rows up to upto_seq, raising journal_floor first so readers
+    # behind it get JournalGap rather than a silently incomplete history
+    conn = tenant.pool.acquire()
+    conn.execute("UPDATE app_meta SET value=MAX(value, ?) WHERE key='journal_floor'", (upto_seq,))
+    # Small batches, each its own transaction, with a pause after each so a booking
+    # waiting on the write lock gets it on its first retry rather than racing the next batch
+    while True:
+        pruned = conn.execute("DELETE FROM write_journal WHERE seq IN "
+                              "(SELECT seq FROM write_journal WHERE seq <= ? ORDER BY seq LIMIT ?)",
+                              (upto_seq, JOURNAL_PRUNE_BATCH)).rowcount
+        conn.commit()
+        if pruned < JOURNAL_PRUNE_BATCH:
+            break
+        sleep(JOURNAL_PRUNE_PAUSE_SEC)
+    conn.close()
+
+
+def prune_journal_older_than(tenant: Tenant, days: int = JOURNAL_KEEP_DAYS) -> int:
+    # Age-based retention for shops without scheduled backups; returns the new floor
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat(timespec='milliseconds')
+    conn = tenant.pool.acquire()
+    upto_seq = conn.execute("SELECT MAX(seq) FROM write_journal WHERE ts < ?", (cutoff,)).fetchone()[0]
+    conn.close()
+    if upto_seq is not None:
+        prune_journal(tenant, upto_seq)
+    return upto_seq or 0
+
+
+def _apply_journal_row(conn: sqlite3.Connection, table: str, op: str, row_id: str, row_json: str):
+    if table not in VERSIONED_TABLES:
+        raise ValueError(f"Unexpected table in journal: {table}")
+    if op == 'DELETE':
+        conn.execute(f"DELETE FROM {table} WHERE id=?", (row_id,))
+        return
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    row = {k: v for k, v in json.loads(row_json).items() if k in cols and k != 'id'}
+    if op == 'UPDATE':
+        # Only the changed fields (older journals carry the whole row)
+        if row:
+            conn.execute(f"UPDATE {table} SET {', '.join(f'{k}=?' for k in row)} WHERE id=?", (*row.values(), row_id))
+        return
+    row['id'] = row_id
+    conn.execute(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+        tuple(row.values()),
+    )
+
+
+JOURNAL_COLUMNS = "seq, ts, table_name, op, row_id, row_json, old_json"
+
+
+def _replay_events(conn: sqlite3.Connection, events: List[tuple]):
+    # Apply journal rows and copy them across as-is, without the triggers journaling them again
+    conn.execute("UPDATE app_meta SET value=1 WHERE key='journal_paused'")
+    for seq, ts, table, op, row_id, row_json, old_json in events:
+        _apply_journal_row(conn, table, op, row_id, row_json)
+        conn.execute(f"INSERT INTO write_journal ({JOURNAL_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (seq, ts, table, op, row_id, row_json, old_json))
+    conn.execute("UPDATE app_meta SET value=0 WHERE key='journal_paused'")
+
+
+def _set_journal_seq(conn: sqlite3.Connection, seq: int):
+    if conn.execute("UPDATE sqlite_sequence SET seq=? WHERE name='write_journal'", (seq,)).rowcount == 0:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('write_journal', ?)", (seq,))
+
+
+def restore_backup(snapshot_path: str, until: datetime = None, tenant: Tenant = None) -> int:
+    # Restore a snapshot into the live shop DB. With `until` (UTC), journal rows
+    # written after the snapshot and up to that moment are replayed on top.
+    # The current state is snapshotted first so a restore can itself be undone.
+    # The live DB's write lock is held from reading its journal to the swap, so no
+    # booking can commit in between and be lost without appearing in that snapshot.
+    tenant = tenant or get_tenant()
+    init_db(tenant)
+    work_path = os.path.join(os.path.dirname(os.path.abspath(snapshot_path)), f".restore-{uuid.uuid4().hex}.db")
+    shutil.copyfile(snapshot_path, work_path)
+    # No statement cache: a BEGIN IMMEDIATE prepared before the ATTACH would be reused
+    # and lock only the work copy, not the live DB
+    conn = sqlite3.connect(work_path, timeout=BUSY_TIMEOUT_SEC, cached_statements=0)
+    try:
+        # Snapshots from an older schema are brought up to date before the replay
+        _run_migrations(conn, tenant)
+        conn.execute("ATTACH DATABASE ? AS live", (tenant.db_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            live_seq = conn.execute("SELECT seq FROM live.sqlite_sequence WHERE name='write_journal'").fetchone()
+            events = []
+            if until is not None:
+                events = conn.execute(
+                    f"SELECT {JOURNAL_COLUMNS} FROM live.write_journal WHERE seq > ? AND ts <= ? ORDER BY seq",
+                    (_journal_seq(conn), until.isoformat(timespec='milliseconds')),
+                ).fetchall()
+            live_version = conn.execute("SELECT value FROM live.app_meta WHERE key='data_version'").fetchone()[0]
+            backup_tenant(tenant, rotate=False)  # a WAL reader, so it can run under our write lock
+
+            # New events continue after everything the live journal ever handed out
+            _set_journal_seq(conn, (live_seq[0] if live_seq else 0) + 1)
+            _replay_events(conn, events)
+            # Cursors into the replaced history are behind the floor and must rescan
+            conn.execute("UPDATE app_meta SET value=? WHERE key='journal_floor'", (_journal_seq(conn),))
+            # Move the version past anything cached from the pre-restore data
+            conn.execute("UPDATE app_meta SET value=? WHERE key='data_version'", (live_version + 1,))
+
+            # Swap the rows in within the same transaction. Copying app_meta last restores
+            # journal_paused and data_version after the triggers have fired on the other tables.
+            # The live feed secret, idempotency keys and slot holds stay: an older snapshot would
+            # invalidate every published feed URL, revive spent keys and bring back stale holds.
+            conn.execute("UPDATE live.app_meta SET value=1 WHERE key='journal_paused'")
+            tables = [r[0] for r in conn.execute(
+                "SELECT name FROM main.sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                "AND name NOT IN ('app_settings', 'submission_keys', 'slot_holds') ORDER BY name='app_meta', name")]
+            for table in tables + ['sqlite_sequence']:
+                cols = ', '.join(r[1] for r in conn.execute(f"PRAGMA live.table_info({table})"))
+                conn.execute(f"DELETE FROM live.{table}")
+                conn.execute(f"INSERT INTO live.{table} ({cols}) SELECT {cols} FROM main.{table}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+        for leftover in (work_path, work_path + '-journal', work_path + '-wal', work_path + '-shm'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    with tenant.cache_lock:
+        tenant.cache.clear()
+    # The restore moved journal_floor past every older snapshot; a fresh one (which also
+    # rotates) keeps replay_journal and point-in-time restores working from here on
+    backup_tenant(tenant)
+    return len(events)
+
+
+@st.cache_resource
+def start_backup_scheduler(interval_min: int = BACKUP_INTERVAL_MIN) -> threading.Event:
+    # One daemon thread per process snapshots every known shop on a fixed interval
+    tenants = _tenant_registry()[0]
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_min * 60):
+            for tenant in list(tenants.values()):
+                try:
+                    backup_tenant(tenant)
+                except Exception:
+                    pass  # recorded in tenant.backup_status for the admin tab
+
+    threading.Thread(target=loop, name='barber-backup', daemon=True).start()
+    return stop
+
+
+@st.cache_resource
+def start_journal_pruner(keep_days: int = JOURNAL_KEEP_DAYS) -> threading.Event:
+    # Stands in for backup rotation when the scheduler is off, so the journal stays bounded
+    tenants = _tenant_registry()[0]
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(3600):
+            for tenant in list(tenants.values()):
+                try:
+                    init_db(tenant)
+                    prune_journal_older_than(tenant, keep_days)
+                except Exception:
+                    pass  # tried again in an hour
+
+    threading.Thread(target=loop, name='barber-journal-prune', daemon=True).start()
+    return stop
+
+
+
+# -----------------------------
+# Event Journal
+# -----------------------------
+
+JOURNAL_READ_LIMIT = 500
+
+
+class JournalGap(Exception):
+    pass
+
+
+def _journal_meta(conn: sqlite3.Connection, key: str) -> int:
+    row = conn.execute("SELECT value FROM app_meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else 0
+
+
+def _event(row: tuple) -> dict:
+    seq, ts, table, op, row_id, row_json, old_json = row
+    return {
+        'seq': seq, 'ts': ts, 'table': table, 'op': op, 'entity_id': row_id,
+        'before': json.loads(old_json) if old_json else None,
+        'after': json.loads(row_json) if row_json else None,
+    }
+
+
+def journal_head() -> int:
+    conn = get_conn()
+    seq = _journal_seq(conn)
+    conn.close()
+    return seq
+
+
+def read_events(after_seq: int = 0, limit: int = JOURNAL_READ_LIMIT, tables: Tuple[str, ...] = None) -> List[dict]:
+    # Events with seq > after_seq, oldest first. Raises JournalGap if some of them
+    # were pruned or replaced by a restore, so the caller knows to rescan instead.
+    query = f"SELECT {JOURNAL_COLUMNS} FROM write_journal WHERE seq > ?"
+    params = [after_seq]
+    if tables:
+        query += f" AND table_name IN ({', '.join('?' for _ in tables)})"
+        params += list(tables)
+    conn = get_conn()
+    rows = conn.execute(query + " ORDER BY seq LIMIT ?", (*params, limit)).fetchall()
+    # Pruning moves the floor in the same commit, so checking after the read is enough
+    floor = _journal_meta(conn, 'journal_floor')
+    conn.close()
+    if after_seq < floor:
+        raise JournalGap(f"journal events after seq {after_seq} are gone (floor is {floor})")
+    return [_event(r) for r in rows]
+
+
+class JournalCursor:
+    # Incremental consumer for the current shop: each poll returns only events it has not seen
+    def __init__(self, after_seq: int = None, tables: Tuple[str, ...] = None):
+        self.seq = journal_head() if after_seq is None else after_seq
+        self.tables = tables
+
+    def poll(self, limit: int = JOURNAL_READ_LIMIT) -> List[dict]:
+        head = journal_head()
+        events = read_events(self.seq, limit, self.tables)
+        if events:
+            self.seq = events[-1]['seq']
+        if len(events) < limit:
+            # Nothing left up to head, including events filtered out by `tables`
+            self.seq = max(self.seq, head)
+        return events
+
+
+def _snapshot_seq(path: str) -> int:
+    snap = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    seq = _journal_seq(snap)
+    snap.close()
+    return seq
+
+
+def _empty_copy(src: sqlite3.Connection, path: str) -> sqlite3.Connection:
+    # Same tables, indexes, triggers and meta values as src, with no rows
+    dst = sqlite3.connect(path)
+    objects = src.execute("SELECT type, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'").fetchall()
+    for kind in ('table', 'index', 'trigger'):
+        for obj_type, sql in objects:
+            if obj_type == kind:
+                dst.execute(sql)
+    dst.executemany("INSERT INTO app_meta (key, value) VALUES (?, ?)", src.execute("SELECT key, value FROM app_meta").fetchall())
+    dst.execute(f"PRAGMA user_version = {src.execute('PRAGMA user_version').fetchone()[0]}")
+    dst.commit()
+    return dst
+
+
+def replay_journal(out_path: str, snapshot_path: str = None, until_seq: int = None,
+                   tenant: Tenant = None) -> Tuple[int, str]:
+    # Rebuild a shop into out_path from its journal. Events are replayed onto the given
+    # snapshot, onto an empty schema while the journal still reaches back to
+    # journal_base_seq, or else onto the newest snapshot the journal covers.
+    tenant = tenant or get_tenant()
+    init_db(tenant)
+    if os.path.exists(out_path):
+        raise FileExistsError(out_path)
+    live = sqlite3.connect(tenant.db_path, timeout=BUSY_TIMEOUT_SEC)
+    try:
+        floor, base_seq = _journal_meta(live, 'journal_floor'), _journal_meta(live, 'journal_base_seq')
+        if snapshot_path is None and floor > base_seq:
+            covered = [p for p in list_backups(tenant) if _snapshot_seq(p) >= floor]
+            if not covered:
+                raise JournalGap("the journal no longer starts from an empty shop; take a backup first")
+            snapshot_path = covered[0]
+        if snapshot_path:
+            start = _snapshot_seq(snapshot_path)
+            if start < floor:
+                raise JournalGap(f"{snapshot_path} is older than the journal (floor is {floor})")
+            shutil.copyfile(snapshot_path, out_path)
+            out = sqlite3.connect(out_path)
+            _set_journal_seq(out, _journal_seq(live))
+            out.commit()
+            _run_migrations(out, tenant)
+            out.isolation_level = ''
+        else:
+            start = base_seq
+            out = _empty_copy(live, out_path)
+        events = live.execute(
+            f"SELECT {JOURNAL_COLUMNS} FROM write_journal WHERE seq > ? AND seq <= ? ORDER BY seq",
+            (start, _journal_seq(live) if until_seq is None else until_seq),
+        ).fetchall()
+        _replay_events(out, events)
+        out.commit()
+        out.close()
+    except Exception:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    finally:
+        live.close()
+    return len(events), snapshot_path or 'empty schema'
+
+
+# -----------------------------
+# Calendar Feeds (iCalendar)
+# -----------------------------
+
+FEED_DAYS = 60  # upcoming days covered by a feed
+FEED_HOST = os.environ.get('BARBER_FEED_HOST', '127.0.0.1')
+FEED_PORT = int(os.environ.get('BARBER_FEED_PORT', '0'))  # > 0 also serves feeds from the app process
+FEED_URL = os.environ.get('BARBER_FEED_URL', f"http://{FEED_HOST}:{FEED_PORT or 8765}")
+FEED_WRITE_BYTES = 64 * 1024
+
+
+def feed_token(scope: str, tenant: Tenant = None) -> str:
+    # Unguessable token per feed; scope is a barber id or 'shop'
+    tenant = tenant or get_tenant()
+    if tenant.feed_secret is None:
+        conn = tenant.pool.acquire()
+        tenant.feed_secret = conn.execute("SELECT value FROM app_settings WHERE key='feed_secret'").fetchone()[0]
+        conn.close()
+    return hmac.new(tenant.feed_secret.encode(), f"{tenant.slug}:{scope}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def feed_path(barber_id: str = None, tenant: Tenant = None) -> str:
+    tenant = tenant or get_tenant()
+    name = f"barbers/{barber_id}.ics" if barber_id else "shop.ics"
+    return f"/{tenant.slug}/{name}?token={feed_token(barber_id or 'shop', tenant)}"
+
+
+def feed_validators(barber_id: str = None, today: date = None) -> Tuple[str, int]:
+    # (ETag, Last-Modified as unix time) from app_meta alone, so a poll that ends in
+    # 304 never reads appointments. The window starts today, so the date is part of it.
+    today = today or date.today()
+    conn = get_conn()
+    meta = dict(conn.execute("SELECT key, value FROM app_meta WHERE key IN ('data_version', 'data_modified')").fetchall())
+    conn.close()
+    etag = f'"{barber_id or "shop"}-{meta["data_version"]}-{today:%Y%m%d}"'
+    return etag, max(meta['data_modified'], int(datetime.combine(today, time()).timestamp()))
+
+
+def _ics_text(value) -> str:
+    return (str(value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _ics_line(line: str) -> str:
+    # Fold at 75 octets (RFC 5545), never splitting a UTF-8 character
+    if len(line) <= 75 and line.isascii():
+        return line + '\r\n'
+    out, size = [], 0
+    for ch in line:
+        n = len(ch.encode('utf-8'))
+        if size + n > 75:
+            out.append('\r\n ')
+            size = 1
+        out.append(ch)
+        size += n
+    return ''.join(out) + '\r\n'
+
+
+def _ics_event(uid: str, stamp: str, start: str, end: str, summary: str, description: str = None) -> str:
+    lines = ['BEGIN:VEVENT', f"UID:{uid}", f"DTSTAMP:{stamp}", start, end, f"SUMMARY:{_ics_text(summary)}"]
+    if description:
+        lines.append(f"DESCRIPTION:{_ics_text(description)}")
+    lines.append('END:VEVENT')
+    return ''.join(_ics_line(x) for x in lines)
+
+
+def ical_feed(barber_id: str = None, days: int = FEED_DAYS, today: date = None):
+    # Yields the feed an event at a time, straight off indexed date-range queries,
+    # all inside one read transaction so it is one consistent snapshot. The ETag is
+    # read just before; a write in between leaves the body newer than its ETag,
+    # which only costs the client a full fetch on its next poll.
+    tenant = get_tenant()
+    today = today or date.today()
+    first, last = today.isoformat(), (today + timedelta(days=days - 1)).isoformat()
+    by_barber = " AND a.barber_id = ?" if barber_id else ""
+    params = (first, last, barber_id) if barber_id else (first, last)
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN")
+        modified = conn.execute("SELECT value FROM app_meta WHERE key='data_modified'").fetchone()[0]
+        stamp = datetime.utcfromtimestamp(modified).strftime('%Y%m%dT%H%M%SZ')
+        barbers = dict(conn.execute("SELECT id, name FROM barbers").fetchall())
+        title = tenant.display_name + (f" - {barbers.get(barber_id, '')}" if barber_id else "")
+        yield ''.join(_ics_line(x) for x in (
+            'BEGIN:VCALENDAR', 'VERSION:2.0', f"PRODID:-//{_ics_text(tenant.display_name)}//Bookings//EN",
+            'CALSCALE:GREGORIAN', f"X-WR-CALNAME:{_ics_text(title)}", 'X-PUBLISHED-TTL:PT5M',
+        ))
+        rows = conn.execute(
+            f"""
+            SELECT a.id, a.barber_id, a.appt_date, a.start_time, a.end_time, a.customer_name, a.customer_phone,
+                   a.notes, COALESCE(s.name, 'Appointment')
+            FROM appointments a LEFT JOIN services s ON s.id = a.service_id
+            WHERE a.appt_date BETWEEN ? AND ?{by_barber}
+            ORDER BY a.appt_date, a.start_time
+            """,
+            params,
+        )
+        for appt_id, b_id, d, start, end, name, phone, notes, service in rows:
+            day = d.replace('-', '')
+            summary = f"{service} - {name}" if barber_id else f"{barbers.get(b_id, '?')}: {service} - {name}"
+            yield _ics_event(f"{appt_id}@{tenant.slug}", stamp, f"DTSTART:{day}T{start.replace(':', '')}00",
+                             f"DTEND:{day}T{end.replace(':', '')}00", summary,
+                             f"Phone: {phone}" + (f"\n{notes}" if notes else ""))
+        rows = conn.execute(
+            f"""
+            SELECT a.id, a.barber_id, a.date, a.start_time, a.end_time, a.reason
+            FROM barber_unavailability a
+            WHERE a.date BETWEEN ? AND ?{by_barber}
+            ORDER BY a.date, a.start_time
+            """,
+            params,
+        )
+        for un_id, b_id, d, start, end, reason in rows:
+            day = d.replace('-', '')
+            if start is None or end is None:
+                next_day = (date.fromisoformat(d) + timedelta(days=1)).strftime('%Y%m%d')
+                start_line, end_line = f"DTSTART;VALUE=DATE:{day}", f"DTEND;VALUE=DATE:{next_day}"
+            else:
+                start_line, end_line = f"DTSTART:{day}T{start.replace(':', '')}00", f"DTEND:{day}T{end.replace(':', '')}00"
+            who = '' if barber_id else f"{barbers.get(b_id, '?')}: "
+            yield _ics_event(f"{un_id}@{tenant.slug}", stamp, start_line, end_line,
+                             f"{who}Unavailable" + (f" ({reason})" if reason else ""))
+        yield _ics_line('END:VCALENDAR')
+    finally:
+        conn.close()  # handing it back to the pool ends the read transaction
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    # GET /<shop>/shop.ics?token=... and /<shop>/barbers/<barber_id>.ics?token=...
+    server_version = 'BarberFeeds/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) == 2 and parts[1] == 'shop.ics':
+            barber_id = None
+        elif len(parts) == 3 and parts[1] == 'barbers' and parts[2].endswith('.ics'):
+            barber_id = parts[2][:-4]
+        else:
+            return self.send_error(404)
+        try:
+            tenant = use_tenant(parts[0]) if parts[0] else None
+        except KeyError:
+            tenant = None
+        token = parse_qs(url.query).get('token', [''])[0]
+        # compare_digest only takes ASCII str; the token in the URL can be anything
+        if tenant is None or not hmac.compare_digest(token.encode(), feed_token(barber_id or 'shop', tenant).encode()):
+            return self.send_error(404)
+
+        etag, modified = feed_validators(barber_id)
+        headers = {'ETag': etag, 'Last-Modified': formatdate(modified, usegmt=True), 'Cache-Control': 'private, no-cache'}
+        if_none_match, if_modified_since = self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')
+        if if_none_match is not None:
+            # Weak comparison (RFC 9110): proxies may hand back our ETag as W/"..."
+            tags = [t.strip() for t in if_none_match.split(',')]
+            fresh = '*' in tags or etag in [t[2:] if t.startswith('W/') else t for t in tags]
+        else:
+            try:
+                fresh = if_modified_since is not None and parsedate_to_datetime(if_modified_since).timestamp() >= modified
+            except (TypeError, ValueError):
+                fresh = False
+        self.send_response(304 if fresh else 200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if fresh:
+            return self.end_headers()
+        self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+        self.end_headers()
+        pending, size = [], 0
+        for chunk in ical_feed(barber_id):
+            data = chunk.encode('utf-8')
+            pending.append(data)
+            size += len(data)
+            if size >= FEED_WRITE_BYTES:
+                self.wfile.write(b''.join(pending))
+                pending, size = [], 0
+        self.wfile.write(b''.join(pending))
+
+    def log_message(self, format, *args):
+        pass  # calendar apps poll every few minutes; don't fill the console
+
+
+def make_feed_server(host: str = FEED_HOST, port: int = FEED_PORT) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), FeedHandler)
+    server.daemon_threads = True
+    return server
+
+
+@st.cache_resource
+def start_feed_server(port: int = FEED_PORT) -> ThreadingHTTPServer:
+    # One feed listener per process, next to the Streamlit server
+    server = make_feed_server(FEED_HOST, port)
+    threading.Thread(target=server.serve_forever, name='barber-feeds', daemon=True).start()
+    return server
+
+
 # -----------------------------
 # Scheduling Logic
 # -----------------------------
@@ -241,6 +1551,7 @@ WORKING_HOURS = {
 }
 
 SLOT_INTERVAL_MIN = 60  # 1 hour slots
+BREAKS = [(time(12, 30), time(13, 30)), (time(17, 30), time(18, 0))]  # lunch and evening break, every open day
 
 
 def weekday_key(d: date) -> str:
@@ -255,13 +1566,10 @@ def list_time_slots(d: date) -> List[time]:
     slots = []
     cur_dt = datetime.combine(d, start)
     end_dt = datetime.combine(d, end)
-    lunch_start = datetime.combine(d, time(12, 30))
-    lunch_end = datetime.combine(d, time(13, 30))
-    break_start = datetime.combine(d, time(17, 30))
-    break_end = datetime.combine(d, time(18, 0))
+    breaks = [(datetime.combine(d, b_start), datetime.combine(d, b_end)) for b_start, b_end in BREAKS]
     while cur_dt <= end_dt - timedelta(minutes=SLOT_INTERVAL_MIN):
         # Skip lunch and evening break
-        if (lunch_start <= cur_dt < lunch_end) or (break_start <= cur_dt < break_end):
+        if any(b_start <= cur_dt < b_end for b_start, b_end in breaks):
             cur_dt += timedelta(minutes=SLOT_INTERVAL_MIN)
             continue
         slots.append(cur_dt.time())
@@ -295,6 +1603,262 @@ def available_start_times(barber_id: str, service_id: str, d: date) -> List[time
     return free
 
 
+def cached_start_times(barber_id: str, service_id: str, d: date, version: int = None,
+                       prefetch: bool = False) -> List[time]:
+    return tenant_cached(('start_times', barber_id, service_id, d),
+                         lambda: available_start_times(barber_id, service_id, d), version, prefetch)
+
+
+def _month_dates(y: int, m: int) -> List[date]:
+    # Days of a month that can still be booked (today on)
+    today = date.today()
+    return [d for d in cal.Calendar(firstweekday=0).itermonthdates(y, m) if d.month == m and d >= today]
+
+
+def month_available_days(barber_id: str, service_id: str, y: int, m: int) -> List[date]:
+    # Bookable days of a month, from today on; built from (and warming) the per-day cache
+    version = get_data_version()
+
+    def load():
+        return [d for d in _month_dates(y, m) if cached_start_times(barber_id, service_id, d, version)]
+    return tenant_cached(('month_days', barber_id, service_id, y, m, date.today()), load, version)
+
+
+PREFETCH_WORKERS = int(os.environ.get('BARBER_PREFETCH_WORKERS', 2))  # 0 turns prefetching off
+
+
+@st.cache_resource
+def _prefetch_executor() -> ThreadPoolExecutor:
+    # Shared by every session in the process; the cache it fills is the tenant's LRU
+    return ThreadPoolExecutor(max_workers=max(1, PREFETCH_WORKERS), thread_name_prefix='barber-prefetch')
+
+
+def _prefetch_month(tenant: Tenant, job: tuple):
+    # Fills only the per-day entries the calendar tab reads (via open_start_times)
+    _, barber_id, service_id, y, m = job
+    try:
+        _current_tenant.set(tenant.slug)
+        version = get_data_version()
+        for d in _month_dates(y, m):
+            cached_start_times(barber_id, service_id, d, version, prefetch=True)
+    finally:
+        with tenant.cache_lock:
+            tenant.prefetch_pending.discard(job)
+
+
+def prefetch_adjacent_months(barber_id: str, service_id: str, y: int, m: int):
+    # Warm the months either side of the one on screen, so flipping to them hits the cache
+    if PREFETCH_WORKERS <= 0:
+        return
+    tenant = get_tenant()
+    today = date.today()
+    version = get_data_version()
+    for delta in (-1, 1):
+        ny, nm = (y, m + delta) if 1 <= m + delta <= 12 else (y + delta, 12 if delta < 0 else 1)
+        if (ny, nm) < (today.year, today.month):
+            continue  # nothing bookable in the past
+        job = (tenant.slug, barber_id, service_id, ny, nm)
+        keys = [('start_times', barber_id, service_id, d) for d in _month_dates(ny, nm)]
+        with tenant.cache_lock:
+            if job in tenant.prefetch_pending or all(tenant.cache.get(k, (None,))[0] == version for k in keys):
+                continue
+            tenant.prefetch_pending.add(job)
+            tenant.prefetch_stats['months'] += 1
+        _prefetch_executor().submit(_prefetch_month, tenant, job)
+
+
+def open_start_times(barber_id: str, service_id: str, d: date, session_id: str = None) -> List[time]:
+    # Cached availability minus the slots other sessions are holding right now
+    times = cached_start_times(barber_id, service_id, d)
+    held = active_holds([barber_id], d, d, session_id).get((barber_id, d.isoformat())) if times else None
+    if not held:
+        return times
+    services = get_services()
+    dur = int(services.loc[services['id'] == service_id, 'duration_min'].iloc[0])
+    return [t for t in times
+            if all(t.hour * 60 + t.minute + dur <= s or t.hour * 60 + t.minute >= e for s, e in held)]
+
+
+NEXT_AVAILABLE_COUNT = 4
+NEXT_AVAILABLE_DAYS = 60
+
+
+def _to_min(hhmm: str) -> int:
+    return int(hhmm[:2]) * 60 + int(hhmm[3:5])
+
+
+def next_available_slots(service_id: str, count: int = NEXT_AVAILABLE_COUNT, days: int = NEXT_AVAILABLE_DAYS,
+                         barber_id: str = None, after: datetime = None, holds: dict = None) -> List[Tuple[date, time, str]]:
+    # Earliest (date, start, barber_id) slots over the horizon. Bookings and
+    # unavailability for the whole range come from two indexed range queries
+    # into per-(barber, day) interval lists; the scan stops at `count` hits.
+    # `holds` (from active_holds) blocks slots other customers are holding.
+    after = after or datetime.now()
+    services = get_services()
+    match = services.loc[services['id'] == service_id, 'duration_min']
+    if match.empty:
+        return []
+    dur = int(match.iloc[0])
+    barber_ids = [barber_id] if barber_id else list(get_barbers()['id'])
+    first, last = after.date(), after.date() + timedelta(days=days - 1)
+    marks = ','.join('?' for _ in barber_ids)
+    busy = {}
+    conn = get_conn()
+    rows = conn.execute(
+        f"SELECT barber_id, appt_date, start_time, end_time FROM appointments "
+        f"WHERE appt_date BETWEEN ? AND ? AND barber_id IN ({marks})",
+        (first.isoformat(), last.isoformat(), *barber_ids),
+    ).fetchall()
+    rows += conn.execute(
+        f"SELECT barber_id, date, COALESCE(start_time, '00:00'), COALESCE(end_time, '24:00') FROM barber_unavailability "
+        f"WHERE date BETWEEN ? AND ? AND barber_id IN ({marks})",
+        (first.isoformat(), last.isoformat(), *barber_ids),
+    ).fetchall()
+    conn.close()
+    for b_id, d_str, start_str, end_str in rows:
+        busy.setdefault((b_id, d_str), []).append((_to_min(start_str), _to_min(end_str)))
+    for key, intervals in (holds or {}).items():
+        busy.setdefault(key, []).extend(intervals)
+
+    slot_minutes = {}  # weekday -> candidate starts that fit before closing
+    found = []
+    d = first
+    while d <= last and len(found) < count:
+        wk = weekday_key(d)
+        if wk not in slot_minutes:
+            hours = WORKING_HOURS.get(wk)
+            close = hours[1].hour * 60 + hours[1].minute if hours else 0
+            slot_minutes[wk] = [s.hour * 60 + s.minute for s in list_time_slots(d) if s.hour * 60 + s.minute + dur <= close]
+        d_str = d.isoformat()
+        floor = after.hour * 60 + after.minute + 1 if d == first else 0
+        for start in slot_minutes[wk]:
+            if start < floor:
+                continue
+            end = start + dur
+            for b_id in barber_ids:
+                if all(end <= s or start >= e for s, e in busy.get((b_id, d_str), ())):
+                    found.append((d, time(start // 60, start % 60), b_id))
+                    break
+            if len(found) >= count:
+                break
+        d += timedelta(days=1)
+    return found
+
+
+# -----------------------------
+# Occupancy Analytics
+# -----------------------------
+
+DAY_MINUTES = 24 * 60
+OCCUPANCY_BIN_MIN = 15  # must divide 60
+OCCUPANCY_DAYS = 90  # default look-back in the admin tab
+
+OCCUPANCY_SQL = """
+    SELECT 0, CAST(julianday(appt_date) - julianday(?) AS INTEGER), barber_id,
+           CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER),
+           CAST(substr(end_time, 1, 2) AS INTEGER) * 60 + CAST(substr(end_time, 4, 2) AS INTEGER)
+    FROM appointments WHERE appt_date BETWEEN ? AND ?
+    UNION ALL
+    SELECT 1, CAST(julianday(date) - julianday(?) AS INTEGER), barber_id,
+           COALESCE(CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER), 0),
+           COALESCE(CAST(substr(end_time, 1, 2) AS INTEGER) * 60 + CAST(substr(end_time, 4, 2) AS INTEGER), 1440)
+    FROM barber_unavailability WHERE date BETWEEN ? AND ?
+"""
+
+
+def open_minutes_mask() -> np.ndarray:
+    # (7, 1440) bool, Monday first: minutes the shop takes bookings (working hours minus breaks)
+    mask = np.zeros((7, DAY_MINUTES), dtype=bool)
+    monday = date(2024, 1, 1)
+    for wd in range(7):
+        hours = WORKING_HOURS.get(weekday_key(monday + timedelta(days=wd)))
+        if hours:
+            mask[wd, hours[0].hour * 60 + hours[0].minute:hours[1].hour * 60 + hours[1].minute] = True
+    for b_start, b_end in BREAKS:
+        mask[:, b_start.hour * 60 + b_start.minute:b_end.hour * 60 + b_end.minute] = False
+    return mask
+
+
+def load_occupancy(first: date, last: date) -> dict:
+    # Bookings and unavailability of every barber over [first, last] from one query,
+    # painted onto (days x barbers x minutes) grids with difference arrays + cumsum.
+    # Returned per OCCUPANCY_BIN_MIN bin: 'booked' and 'open' minutes, plus the
+    # minute-level idle runs ('gaps') that analysis needs at full resolution.
+    barber_ids = list(get_barbers()['id'])
+    n_days, n_barbers = (last - first).days + 1, len(barber_ids)
+    conn = get_conn()
+    rows = conn.execute(OCCUPANCY_SQL, (first.isoformat(), first.isoformat(), last.isoformat()) * 2).fetchall()
+    conn.close()
+    index = {b_id: i for i, b_id in enumerate(barber_ids)}
+    rows = [(k, d, index[b], max(0, lo), min(DAY_MINUTES, hi)) for k, d, b, lo, hi in rows if b in index and hi > lo]
+    paint = np.zeros((2, n_days, n_barbers, DAY_MINUTES + 1), dtype=np.int16)
+    if rows:
+        kind, day, barber, start, end = np.array(rows, dtype=np.int64).T
+        np.add.at(paint, (kind, day, barber, start), 1)
+        np.add.at(paint, (kind, day, barber, end), -1)
+    covered = np.cumsum(paint[..., :DAY_MINUTES], axis=-1, dtype=np.int16) > 0
+    weekdays = (np.arange(n_days) + first.weekday()) % 7
+    open_ = open_minutes_mask()[weekdays][:, None, :] & ~covered[1]
+    booked = covered[0] & open_
+
+    # Idle runs: open, unbooked stretches, split by breaks, closing time and bookings
+    idle = (open_ & ~booked).reshape(-1, DAY_MINUTES).view(np.int8)
+    edges = np.diff(idle, axis=1, prepend=0, append=0)
+    starts_row, starts_min = np.nonzero(edges == 1)
+    _, ends_min = np.nonzero(edges == -1)
+
+    bins = DAY_MINUTES // OCCUPANCY_BIN_MIN
+    return {
+        'first': first, 'barber_ids': barber_ids, 'weekdays': weekdays,
+        'booked': booked.reshape(n_days, n_barbers, bins, OCCUPANCY_BIN_MIN).sum(axis=-1, dtype=np.int16),
+        'open': open_.reshape(n_days, n_barbers, bins, OCCUPANCY_BIN_MIN).sum(axis=-1, dtype=np.int16),
+        'gaps': np.stack([starts_row % n_barbers, ends_min - starts_min]) if n_barbers else np.zeros((2, 0), dtype=np.int64),
+    }
+
+
+def utilization(occ: dict, barber: int = None) -> Tuple[float, np.ndarray]:
+    # Overall utilization and a (7 weekdays x 24 hours) booked/open ratio; NaN where the shop is closed
+    booked, open_ = (occ['booked'], occ['open']) if barber is None else (occ['booked'][:, [barber]], occ['open'][:, [barber]])
+    def day_hours(minutes: np.ndarray) -> np.ndarray:
+        return minutes.sum(axis=1, dtype=np.int64).reshape(len(minutes), 24, 60 // OCCUPANCY_BIN_MIN).sum(axis=-1)
+
+    booked_wh, open_wh = np.zeros((7, 24)), np.zeros((7, 24))
+    np.add.at(booked_wh, occ['weekdays'], day_hours(booked))
+    np.add.at(open_wh, occ['weekdays'], day_hours(open_))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        grid = np.where(open_wh > 0, booked_wh / open_wh, np.nan)
+    total_open = open_wh.sum()
+    return (booked_wh.sum() / total_open if total_open else 0.0), grid
+
+
+def barber_utilization(occ: dict) -> np.ndarray:
+    open_ = occ['open'].sum(axis=(0, 2), dtype=np.int64)
+    return np.divide(occ['booked'].sum(axis=(0, 2), dtype=np.int64), open_, out=np.zeros(len(open_)), where=open_ > 0)
+
+
+def peak_hours(grid: np.ndarray, top: int = 5) -> List[Tuple[int, int, float]]:
+    # Busiest (weekday, hour, utilization) cells of a utilization grid
+    flat = np.where(np.isnan(grid), -1, grid).ravel()
+    order = np.argsort(flat)[::-1][:top]
+    return [(int(i // 24), int(i % 24), float(flat[i])) for i in order if flat[i] > 0]
+
+
+def idle_gap_summary(occ: dict, barber: int = None, shortest: int = None) -> dict:
+    # Idle stretches; those shorter than the shortest service can never be sold
+    if shortest is None:
+        services = get_services()
+        shortest = int(services['duration_min'].min()) if not services.empty else SLOT_INTERVAL_MIN
+    gap_barber, lengths = occ['gaps']
+    if barber is not None:
+        lengths = lengths[gap_barber == barber]
+    unsellable = lengths[lengths < shortest]
+    return {
+        'gaps': int(len(lengths)), 'idle_min': int(lengths.sum()),
+        'median_min': float(np.median(lengths)) if len(lengths) else 0.0,
+        'unsellable': int(len(unsellable)), 'unsellable_min': int(unsellable.sum()), 'shortest': shortest,
+    }
+
+
 # -----------------------------
 # Calendar Helpers
 # -----------------------------
@@ -302,10 +1866,27 @@ def available_start_times(barber_id: str, service_id: str, d: date) -> List[time
 def ensure_session_defaults():
     if 'book_date' not in st.session_state:
         st.session_state['book_date'] = date.today()
+    # The date picker's own state; whatever moves book_date before the picker is drawn moves this too
+    if st.session_state.get('date_input_main', date.min) < date.today():
+        st.session_state['date_input_main'] = max(st.session_state['book_date'], date.today())
     if 'cal_year' not in st.session_state or 'cal_month' not in st.session_state:
         today = date.today()
         st.session_state['cal_year'] = today.year
         st.session_state['cal_month'] = today.month
+    if 'submit_nonce' not in st.session_state:
+        st.session_state['submit_nonce'] = uuid.uuid4().hex
+
+
+def resolve_tenant() -> str:
+    # ?shop=<slug> wins, then the session's shop, then BARBER_SHOP, then the default shop
+    slug = st.query_params.get('shop', None) or st.session_state.get('tenant') or os.environ.get('BARBER_SHOP', DEFAULT_TENANT)
+    try:
+        get_tenant(slug)
+    except KeyError:
+        st.error(f"Unknown shop '{html.escape(slug)}'.")
+        st.stop()
+    st.session_state['tenant'] = slug
+    return slug
 
 
 def month_label(y: int, m: int) -> str:
@@ -344,37 +1925,159 @@ def is_mobile():
     return False
 
 
+WEEKDAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def month_grid_html(y: int, m: int, enabled: List[date]) -> str:
+    enabled = set(enabled)
+    parts = ['<div class="calendar-wrapper"><table class="calendar-table"><thead><tr>']
+    parts.extend(f'<th>{w}</th>' for w in WEEKDAY_LABELS)
+    parts.append('</tr></thead><tbody>')
+    for week in cal.Calendar(firstweekday=0).monthdatescalendar(y, m):
+        parts.append('<tr>')
+        for d in week:
+            if d in enabled:
+                parts.append(f'<td><button onclick="window.location.search=window.location.search+`&pick={d.isoformat()}`" class="calendar-btn">{d.day}</button></td>')
+            else:
+                parts.append(f'<td><div class="calendar-cell disabled">{d.day}</div></td>')
+        parts.append('</tr>')
+    parts.append('</tbody></table></div>')
+    return ''.join(parts)
+
+
+def slot_buttons_html(times: List[time], d: date, expired_count: int, shop: str) -> str:
+    # Slots are sorted, so the expired ones (today only) are always a prefix.
+    # The date travels with the pick, so the hold is placed on the day the customer saw.
+    shop = html.escape(shop)
+    parts = ['<div class="slot-grid">']
+    for i, tm in enumerate(times):
+        time_str = tm.strftime('%H:%M')
+        if i < expired_count:
+            parts.append(f'<button disabled class="slot-btn">{time_str}</button>')
+        else:
+            parts.append(f'<form action="" method="get" class="slot-form"><input type="hidden" name="shop" value="{shop}">'
+                         f'<input type="hidden" name="pick_date" value="{d.isoformat()}">'
+                         f'<button name="pick_time" value="{time_str}" class="slot-btn">{time_str}</button></form>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+
+def utilization_heatmap_html(grid: np.ndarray) -> str:
+    # Weekday rows x opening-hour columns, shaded by utilization; '–' where a day is closed at that hour
+    hours = [h for h in range(24) if not np.isnan(grid[:, h]).all()]
+    parts = ['<div class="heatmap-wrapper"><table class="heatmap-table"><thead><tr><th></th>']
+    parts.extend(f'<th>{h:02d}</th>' for h in hours)
+    parts.append('</tr></thead><tbody>')
+    for wd, label in enumerate(WEEKDAY_LABELS):
+        parts.append(f'<tr><th>{label}</th>')
+        for h in hours:
+            u = grid[wd, h]
+            if np.isnan(u):
+                parts.append('<td class="heatmap-closed">–</td>')
+            else:
+                parts.append(f'<td style="background: rgba(45, 140, 255, {u:.2f}); color: {"#fff" if u > 0.55 else "#222"}">{u:.0%}</td>')
+        parts.append('</tr>')
+    parts.append('</tbody></table></div>')
+    return ''.join(parts)
+
+
+def format_price(price: float) -> str:
+    price = float(price)
+    return f"Rs {int(price) if price.is_integer() else price}"
+
+
+def _service_emoji(name: str) -> str:
+    if '+' in name:
+        return '💇‍♂️' + ''.join(e for key, e in (('Shave', '+🪒'), ('Beard', '+🧔'), ('color', '+🎨')) if key in name)
+    for key, emoji in (('Kids', '🧒'), ('Senior', '🧓'), ('Beard', '🧔'), ('Shave', '🪒'), ('color', '🎨')):
+        if key in name:
+            return emoji
+    return '👨'
+
+
+def _service_tone(name: str) -> str:
+    # Per-item colour class, matching the colours of the printed price list
+    if '+' in name:
+        return 'combo-shave' if 'Shave' in name else 'combo-beard' if 'Beard' in name else 'combo-color'
+    for key, tone in (('Kids', 'kids'), ('Senior', 'senior'), ('Beard', 'beard'), ('Shave', 'shave'), ('color', 'color')):
+        if key in name:
+            return tone
+    return 'men'
+
+
+def price_list_html(services: pd.DataFrame) -> str:
+    # Grouped like the printed price list and ordered as in the catalog template
+    catalog_order = {name: i for i, (name, _, _) in enumerate(load_service_catalog())}
+    sections = {'haircut': [], 'beard': [], 'combo': []}
+    rows = sorted(services.itertuples(index=False), key=lambda r: (catalog_order.get(r.name, len(catalog_order)), r.name))
+    for row in rows:
+        if '+' in row.name:
+            group = 'combo'
+        elif any(k in row.name for k in ('Beard', 'Shave', 'color')):
+            group = 'beard'
+        else:
+            group = 'haircut'
+        sections[group].append(
+            f'<li class="tone-{_service_tone(row.name)}"><span class="price-emoji">{_service_emoji(row.name)}</span> '
+            f'<span class="price-name">{html.escape(row.name)}</span> '
+            f'<span class="price-amount">{format_price(row.price)}</span></li>'
+        )
+    parts = ['<div class="price-card"><h3>✂️🪒 <span>Barber Shop Price List</span></h3>']
+    for group, title in (('haircut', 'Haircuts'), ('beard', 'Beard &amp; Color'), ('combo', 'Combo Deals')):
+        parts.append(f'<div class="price-section"><b>{title}</b></div><ul class="price-list price-{group}">{"".join(sections[group])}</ul>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+
+def choose_time(barber_id: str, service_id: str, d: date, time_str: str) -> bool:
+    # Hold the slot for this session before showing it as chosen
+    try:
+        start = datetime.strptime(time_str, '%H:%M').time()
+    except ValueError:
+        return False
+    if hold_slot(st.session_state['submit_nonce'], barber_id, service_id, d, start) is None:
+        st.session_state['chosen_time'] = None
+        st.warning(f"{time_str} was just taken or is being booked by someone else. Please pick another time.")
+        return False
+    st.session_state['chosen_time'] = time_str
+    st.session_state['held_service_id'] = service_id
+    st.session_state['scroll_to_quick_book'] = True
+    return True
+
+
+def pick_next_available(barber_id: str, service_id: str, slot_date: date, time_str: str):
+    # on_click callback, so it runs before the rerun draws the date picker and can move
+    # the picker's own state to the slot's day; otherwise the picker's old value wins
+    st.session_state['book_date'] = slot_date
+    st.session_state['date_input_main'] = slot_date
+    st.session_state['show_pricing_sidebar'] = False
+    choose_time(barber_id, service_id, slot_date, time_str)
+
+
+def booking_service_id(services_df: pd.DataFrame, selected: List[str], name_map: dict, fallback: str) -> str:
+    # The service a confirmation books (the first one selected), so holds and the times
+    # offered cover its real length; the calendar default until something is selected
+    if selected:
+        db_match = services_df[services_df['name'].str.strip() == name_map.get(selected[0], '').strip()]
+        if not db_match.empty:
+            return db_match['id'].values[0]
+    return fallback
+
+
+def client_ip():
+    try:
+        return forwarded_client(st.context.ip_address, st.context.headers.get('X-Forwarded-For'))
+    except Exception:
+        return None
+
+
 def render_month_grid(barber_id: str, service_id: str):
     y, m = st.session_state['cal_year'], st.session_state['cal_month']
-    month_cal = cal.Calendar(firstweekday=0).monthdatescalendar(y, m)
     st.markdown(f"### {month_label(y, m)}")
-    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    today = date.today()
-    any_enabled = False
+    enabled = month_available_days(barber_id, service_id, y, m)
     if is_mobile():
         # Render as HTML table for mobile
-        table_html = '<div class="calendar-wrapper"><table style="width:100%; min-width:420px;"><thead><tr>'
-        for w in days:
-            table_html += f'<th>{w}</th>'
-        table_html += '</tr></thead><tbody>'
-        for week in month_cal:
-            table_html += '<tr>'
-            for i, d in enumerate(week):
-                is_current_month = (d.month == m)
-                times = available_start_times(barber_id, service_id, d) if is_current_month else []
-                label = f"{d.day}"
-                disabled = (len(times) == 0) or (d < today) or (not is_current_month)
-                cell_class = "calendar-cell disabled" if disabled else "calendar-cell"
-                btn = ''
-                if is_current_month and not disabled:
-                    any_enabled = True
-                    btn = f'<button onclick="window.location.search=window.location.search+`&pick={d.isoformat()}`" class="calendar-btn">{label}</button>'
-                else:
-                    btn = f'<div class="{cell_class}">{label}</div>'
-                table_html += f'<td style="padding:0;">{btn}</td>'
-            table_html += '</tr>'
-        table_html += '</tbody></table></div>'
-        st.markdown(table_html, unsafe_allow_html=True)
+        st.markdown(month_grid_html(y, m, enabled), unsafe_allow_html=True)
         # Handle pick from query param
         pick = st.query_params.get('pick', None)
         if pick:
@@ -388,30 +2091,23 @@ def render_month_grid(barber_id: str, service_id: str):
                 pass
     else:
         # Desktop: use st.columns
+        enabled = set(enabled)
         header = st.columns(7)
-        for i, w in enumerate(days):
+        for i, w in enumerate(WEEKDAY_LABELS):
             header[i].markdown(f"**{w}**")
-        for week in month_cal:
+        for week in cal.Calendar(firstweekday=0).monthdatescalendar(y, m):
             cols = st.columns(7)
             for i, d in enumerate(week):
-                is_current_month = (d.month == m)
-                times = available_start_times(barber_id, service_id, d) if is_current_month else []
-                label = f"{d.day}"
-                disabled = (len(times) == 0) or (d < today) or (not is_current_month)
-                cell_class = "calendar-cell disabled" if disabled else "calendar-cell"
                 with cols[i]:
-                    if is_current_month:
-                        if disabled:
-                            st.markdown(f'<div class="{cell_class}">{label}</div>', unsafe_allow_html=True)
-                        else:
-                            any_enabled = True
-                            if st.button(label, key=f"day-{d.isoformat()}"):
-                                st.session_state['book_date'] = d
-                                st.session_state['scroll_to_times'] = True
+                    if d in enabled:
+                        if st.button(f"{d.day}", key=f"day-{d.isoformat()}"):
+                            st.session_state['book_date'] = d
+                            st.session_state['scroll_to_times'] = True
                     else:
-                        st.markdown(f'<div class="{cell_class}">{label}</div>', unsafe_allow_html=True)
-    if not any_enabled:
+                        st.markdown(f'<div class="calendar-cell disabled">{d.day}</div>', unsafe_allow_html=True)
+    if not enabled:
         st.info("No available days for booking in this month. Please try another month.")
+    prefetch_adjacent_months(barber_id, service_id, y, m)
 
 
 # -----------------------------
@@ -458,10 +2154,52 @@ st.markdown('''
     /* Reduce space between columns for time slots */
     .stColumns { gap: 2px !important; margin: 0 !important; }
     .stButton { margin: 0 !important; padding: 0 !important; }
+    .calendar-table { width: 100%; min-width: 420px; }
+    .calendar-table td { padding: 0; }
+    /* Time slot buttons */
+    .slot-grid { display: flex; flex-wrap: wrap; gap: 16px 24px; }
+    .slot-form { margin: 0 0 12px 0; padding: 0; display: inline; }
+    .slot-btn {
+      background: #18191a; color: #fff; border: 1.5px solid #888; border-radius: 10px; font-size: 1em;
+      padding: 0.15em 1.5em; margin: 0; min-width: 90px; min-height: 48px; cursor: pointer; display: inline-block;
+    }
+    .slot-btn:disabled { background: #222; color: #888; opacity: 0.5; cursor: default; }
+    /* Utilization heatmap */
+    .heatmap-wrapper { overflow-x: auto; margin-bottom: 1em; }
+    .heatmap-table { border-collapse: collapse; font-size: 0.85em; }
+    .heatmap-table th { padding: 2px 6px; font-weight: 600; color: #888; }
+    .heatmap-table td { padding: 6px 4px; min-width: 42px; text-align: center; border: 1px solid #2a2a2a; }
+    .heatmap-table td.heatmap-closed { color: #666; background: #18191a; }
+    /* Price list */
+    .price-card {
+      background: #f7f7fa; border-radius: 10px; padding: 1.2em 1.5em; margin-bottom: 1em;
+      box-shadow: 0 2px 8px #e0e0e0; max-width: 480px;
+    }
+    .price-card h3 { margin-top: 0; margin-bottom: 0.7em; font-size: 1.3em; color: #465a77; }
+    .price-card h3 span { color: #222; }
+    .price-section { margin-bottom: 0.7em; color: #465a77; }
+    .price-list { list-style: none; padding-left: 0; margin-bottom: 0.7em; }
+    .price-emoji { font-size: 1.2em; }
+    .price-amount { float: right; font-weight: bold; }
+    .price-haircut .price-amount { color: #27ae60; } .price-beard .price-amount { color: #2980b9; }
+    .tone-men .price-name { color: #2d8cff; } .tone-kids .price-name { color: #e67e22; } .tone-senior .price-name { color: #8e44ad; }
+    .tone-beard .price-name { color: #d35400; } .tone-shave .price-name { color: #c0392b; } .tone-color .price-name { color: #16a085; }
+    .tone-combo-color .price-name, .tone-combo-color .price-amount { color: #e67e22; }
+    .tone-combo-beard .price-name, .tone-combo-beard .price-amount { color: #8e44ad; }
+    .tone-combo-shave .price-name, .tone-combo-shave .price-amount { color: #16a085; }
     </style>
 ''', unsafe_allow_html=True)
 
-init_db()
+tenant = use_tenant(resolve_tenant())
+# Background threads only under Streamlit (streamlit run, AppTest). manage.py and the
+# benchmarks import this script, which renders the page once in bare mode; a second
+# backup loop there would race the app's own.
+if BACKUP_INTERVAL_MIN > 0 and st.runtime.exists():
+    start_backup_scheduler()
+elif JOURNAL_KEEP_DAYS > 0 and st.runtime.exists():
+    start_journal_pruner()
+if FEED_PORT > 0 and st.runtime.exists():
+    start_feed_server()  # 'manage.py serve-feeds' runs its own; a second bind would fail
 ensure_session_defaults()
 
 # Custom header with emoji and new title as a table for alignment
@@ -470,7 +2208,7 @@ st.markdown('''
   <tr style="border:none;background:none;">
     <td style="border:none;background:none;vertical-align:middle;"><span style="font-size:2.5em;">✂️🪒</span></td>
     <td style="border:none;background:none;vertical-align:middle;">
-      <span style="background:#465a77;padding:0.2em 0.7em;margin-left:0.5em;border-radius:4px;color:#fff;font-size:1.15em;font-weight:bold;">The Groom Room</span>
+      <span style="background:#465a77;padding:0.2em 0.7em;margin-left:0.5em;border-radius:4px;color:#fff;font-size:1.15em;font-weight:bold;">''' + html.escape(tenant.display_name) + '''</span>
       <span style="font-size:0.85em;color:#bbb;margin-left:0.7em;">by Pravesh</span>
     </td>
   </tr>
@@ -494,90 +2232,14 @@ with top_cols[0]:
         st.session_state['show_pricing_sidebar'] = True
         st.session_state['pricing_btn_counter'] += 1  # Only increment here
 
-# Move pricing list to main page, below header, and show/expand when button is clicked
-if False and st.session_state.get('show_pricing_sidebar', False):
-    # Generate dynamic pricing list from DB
-    haircuts = []
-    beard_color = []
-    combos = []
-    for _, row in services_df.iterrows():
-        name = row['name']
-        price = row['price']
-        price_str = f"Rs {int(price) if price.is_integer() else price}"
-        if 'Haircut' in name and '+' not in name:
-            if 'Kids' in name:
-                haircuts.append(f'<li><span style="font-size:1.2em;">🧒</span> <span style="color:#e67e22;">{name}</span> <span style="float:right;color:#27ae60;font-weight:bold;">{price_str}</span></li>')
-            elif 'Seniors' in name:
-                haircuts.append(f'<li><span style="font-size:1.2em;">�</span> <span style="color:#8e44ad;">{name}</span> <span style="float:right;color:#27ae60;font-weight:bold;">{price_str}</span></li>')
-            else:
-                haircuts.append(f'<li><span style="font-size:1.2em;">👨</span> <span style="color:#2d8cff;">{name}</span> <span style="float:right;color:#27ae60;font-weight:bold;">{price_str}</span></li>')
-        elif 'Beard' in name or 'Shave' in name or 'color' in name:
-            if 'Beard' in name:
-                beard_color.append(f'<li><span style="font-size:1.2em;">🧔</span> <span style="color:#d35400;">{name}</span> <span style="float:right;color:#2980b9;font-weight:bold;">{price_str}</span></li>')
-            elif 'Shave' in name:
-                beard_color.append(f'<li><span style="font-size:1.2em;">🪒</span> <span style="color:#c0392b;">{name}</span> <span style="float:right;color:#2980b9;font-weight:bold;">{price_str}</span></li>')
-            else:
-                beard_color.append(f'<li><span style="font-size:1.2em;">🎨</span> <span style="color:#16a085;">{name}</span> <span style="float:right;color:#2980b9;font-weight:bold;">{price_str}</span></li>')
-        elif '+' in name:
-            combos.append(f'<li><span style="font-size:1.2em;">💇‍♂️+🪒+🎨</span> <span style="color:#16a085;">{name}</span> <span style="float:right;color:#16a085;font-weight:bold;">{price_str}</span></li>')
-    
-    haircuts_html = '\n        '.join(haircuts)
-    beard_color_html = '\n        '.join(beard_color)
-    combos_html = '\n        '.join(combos)
-    
-    st.markdown(f'''
-    <div style="background:#f7f7fa;border-radius:10px;padding:1.2em 1.5em 1.2em 1.5em;margin-bottom:1em;box-shadow:0 2px 8px #e0e0e0;max-width:480px;">
-      <h3 style="margin-top:0;margin-bottom:0.7em;font-size:1.3em;color:#465a77;">✂️� <span style="color:#222;">Barber Shop Price List</span></h3>
-      <div style="margin-bottom:0.7em;"><b style="color:#465a77;">Haircuts</b></div>
-      <ul style="list-style:none;padding-left:0;margin-bottom:0.7em;">
-        {haircuts_html}›
-      </ul>
-      <div style="margin-bottom:0.7em;"><b style="color:#465a77;">Beard & Color</b></div>
-      <ul style="list-style:none;padding-left:0;margin-bottom:0.7em;">
-        {beard_color_html}
-      </ul>
-      <div style="margin-bottom:0.7em;"><b style="color:#465a77;">Combo Deals</b></div>
-      <ul style="list-style:none;padding-left:0;">
-        {combos_html}
-      </ul>
-    </div>
-    ''', unsafe_allow_html=True)
-    if st.button('Close', key='close_pricing_sidebar_old'):
-        st.session_state['show_pricing_sidebar'] = False
-
 # Hide sidebar if user interacts with main area (simulate click outside)
 def hide_sidebar_on_interaction():
     if st.session_state.get('show_pricing_sidebar', False):
         st.session_state['show_pricing_sidebar'] = False
 
-barbers_df = get_barbers()
-services_df = get_services()
-
 # Move pricing list to main page, below header, and show/expand when button is clicked
 if st.session_state.get('show_pricing_sidebar', False):
-    st.markdown('''
-    <div style="background:#f7f7fa;border-radius:10px;padding:1.2em 1.5em 1.2em 1.5em;margin-bottom:1em;box-shadow:0 2px 8px #e0e0e0;max-width:480px;">
-      <h3 style="margin-top:0;margin-bottom:0.7em;font-size:1.3em;color:#465a77;">✂️🪒 <span style="color:#222;">Barber Shop Price List</span></h3>
-      <div style="margin-bottom:0.7em;"><b style="color:#465a77;">Haircuts</b></div>
-      <ul style="list-style:none;padding-left:0;margin-bottom:0.7em;">
-        <li><span style="font-size:1.2em;">👨</span> <span style="color:#2d8cff;">Men's Haircut</span> <span style="float:right;color:#27ae60;font-weight:bold;">Rs 100</span></li>
-        <li><span style="font-size:1.2em;">🧒</span> <span style="color:#e67e22;">Kids' Haircut (under 15)</span> <span style="float:right;color:#27ae60;font-weight:bold;">Rs 75</span></li>
-        <li><span style="font-size:1.2em;">🧓</span> <span style="color:#8e44ad;">Seniors' Cut</span> <span style="float:right;color:#27ae60;font-weight:bold;">Rs 75</span></li>
-      </ul>
-      <div style="margin-bottom:0.7em;"><b style="color:#465a77;">Beard & Color</b></div>
-      <ul style="list-style:none;padding-left:0;margin-bottom:0.7em;">
-        <li><span style="font-size:1.2em;">🧔</span> <span style="color:#d35400;">Beard Trim</span> <span style="float:right;color:#2980b9;font-weight:bold;">Rs 50</span></li>
-        <li><span style="font-size:1.2em;">🪒</span> <span style="color:#c0392b;">Shave Normal</span> <span style="float:right;color:#2980b9;font-weight:bold;">Rs 25</span></li>
-        <li><span style="font-size:1.2em;">🎨</span> <span style="color:#16a085;">Hair color / Dry</span> <span style="float:right;color:#2980b9;font-weight:bold;">Rs 25</span></li>
-      </ul>
-      <div style="margin-bottom:0.7em;"><b style="color:#465a77;">Combo Deals</b></div>
-      <ul style="list-style:none;padding-left:0;">
-        <li><span style="font-size:1.2em;">💇‍♂️+🎨</span> <span style="color:#e67e22;">Haircut + hair color/Dry</span> <span style="float:right;color:#e67e22;font-weight:bold;">Rs 125</span></li>
-        <li><span style="font-size:1.2em;">💇‍♂️+🧔</span> <span style="color:#8e44ad;">Haircut + Beard Trim</span> <span style="float:right;color:#8e44ad;font-weight:bold;">Rs 150</span></li>
-        <li><span style="font-size:1.2em;">💇‍♂️+🪒+🎨</span> <span style="color:#16a085;">Haircut + Shave + hair color/Dry</span> <span style="float:right;color:#16a085;font-weight:bold;">Rs 175</span></li>
-      </ul>
-    </div>
-    ''', unsafe_allow_html=True)
+    st.markdown(tenant_cached('price_list_html', lambda: price_list_html(services_df)), unsafe_allow_html=True)
     if st.button('Close', key='close_pricing_sidebar'):
         st.session_state['show_pricing_sidebar'] = False
 
@@ -589,9 +2251,53 @@ with cal_tab:
     # Use default barber/service (first in list) for calendar tab
     cal_barber_id = barbers_df.iloc[0]['id']
     cal_service_id = services_df.iloc[0]['id']
+    # Always show all services in the specified order, regardless of DB content
+    service_options = [
+        "Men's Haircut (Rs 100)",
+        "Kids' Haircut (under 15) (Rs 75)",
+        "Seniors' Cut (Rs 75)",
+        "Beard Trim (Rs 50)",
+        "Shave Normal (Rs 25)",
+        "Hair color / Dry (Rs 25)",
+        "Haircut + hair color/Dry (Rs 125)",
+        "Haircut + Beard Trim (Rs 150)",
+        "Haircut + Shave + hair color/Dry (Rs 175)",
+    ]
+    name_map = {
+        "Men's Haircut (Rs 100)": "Men's Haircut",
+        "Kids' Haircut (under 15) (Rs 75)": "Kids' Haircut (under 15)",
+        "Seniors' Cut (Rs 75)": "Seniors' Cut",
+        "Beard Trim (Rs 50)": "Beard Trim",
+        "Shave Normal (Rs 25)": "Shave Normal",
+        "Hair color / Dry (Rs 25)": "Hair color / Dry",
+        "Haircut + hair color/Dry (Rs 125)": "Haircut + hair color/Dry",
+        "Haircut + Beard Trim (Rs 150)": "Haircut + Beard Trim",
+        "Haircut + Shave + hair color/Dry (Rs 175)": "Haircut + Shave + hair color/Dry",
+    }
+    book_service_id = booking_service_id(services_df, st.session_state.get('cal_services', []), name_map, cal_service_id)
+    hold_session = st.session_state['submit_nonce']
+    # A slot button reloads the page, so it carries the day it was picked on
+    pick_date = st.query_params.get('pick_date', None)
+    if pick_date:
+        try:
+            st.session_state['book_date'] = st.session_state['date_input_main'] = max(date.fromisoformat(pick_date), date.today())
+        except ValueError:
+            pass
+    # One-tap "next available" slots, so customers don't have to hunt day by day.
+    # Slots other customers are holding are skipped. Not cached: the answer moves with the
+    # clock and every hold, and the search is two indexed range queries that stop early.
+    horizon_holds = active_holds([cal_barber_id], date.today(), date.today() + timedelta(days=NEXT_AVAILABLE_DAYS - 1), hold_session)
+    next_slots = next_available_slots(book_service_id, barber_id=cal_barber_id, holds=horizon_holds)
+    if next_slots:
+        st.markdown("**Next available:**")
+        next_cols = st.columns(len(next_slots))
+        for col, (slot_date, slot_time, _) in zip(next_cols, next_slots):
+            col.button(f"{slot_date.strftime('%a %d/%m')} {slot_time.strftime('%H:%M')}",
+                       key=f"next-{slot_date.isoformat()}-{slot_time.strftime('%H%M')}", on_click=pick_next_available,
+                       args=(cal_barber_id, book_service_id, slot_date, slot_time.strftime('%H:%M')))
     # Show selected date in YYYY/MM/DD format above the picker
     st.markdown(f"**Selected date:** {st.session_state['book_date'].strftime('%Y/%m/%d')}")
-    picked_date = st.date_input("Pick a date", value=st.session_state['book_date'], min_value=date.today(), key='date_input_main')
+    picked_date = st.date_input("Pick a date", min_value=date.today(), key='date_input_main')
     if picked_date != st.session_state['book_date']:
         st.session_state['book_date'] = picked_date
         st.session_state['scroll_to_times'] = True
@@ -610,35 +2316,22 @@ with cal_tab:
     if book_date < today:
         st.warning("You cannot book appointments for past dates.")
     else:
-        times = available_start_times(cal_barber_id, cal_service_id, book_date)
+        times = open_start_times(cal_barber_id, book_service_id, book_date, hold_session)
+        # Handle button click via query param
+        pick_time = st.query_params.get('pick_time', None)
+        if pick_time:
+            choose_time(cal_barber_id, book_service_id, book_date, pick_time)
+            st.query_params.clear()
         if not times:
             st.info("No free slots on this day — try another.")
         else:
             # Render time slot buttons in a compact custom HTML grid (horizontally stacked, wrapping)
-            now = datetime.now()
-            is_today = (book_date == today)
-            btn_html = '<div style="display:flex;flex-wrap:wrap;gap:16px 24px;">'
-            for i, tm in enumerate(times):
-                time_str = tm.strftime('%H:%M')
-                # Disable expired slots for today
-                expired = False
-                if is_today:
-                    slot_dt = datetime.combine(book_date, tm)
-                    if slot_dt <= now:
-                        expired = True
-                if expired:
-                    btn_html += f'''<button disabled style="background:#222;color:#888;border:1.5px solid #888;border-radius:10px;font-size:1em;padding:0.15em 1.5em;margin:0;min-width:90px;min-height:48px;opacity:0.5;">{time_str}</button>'''
-                else:
-                    btn_html += f'''<form action="" method="get" style="margin:0 0 12px 0;padding:0;display:inline;">
-                    <button name="pick_time" value="{time_str}" style="background:#18191a;color:#fff;border:1.5px solid #888;border-radius:10px;font-size:1em;padding:0.15em 1.5em;margin:0;min-width:90px;min-height:48px;cursor:pointer;display:inline-block;">{time_str}</button></form>'''
-            btn_html += '</div>'
-            st.markdown(btn_html, unsafe_allow_html=True)
-            # Handle button click via query param
-            pick_time = st.query_params.get('pick_time', None)
-            if pick_time:
-                st.session_state['chosen_time'] = pick_time
-                st.session_state['scroll_to_quick_book'] = True
-                st.query_params.clear()
+            # Disable expired slots for today
+            expired_count = 0
+            if book_date == today:
+                now_str = datetime.now().strftime('%H:%M')
+                expired_count = sum(1 for tm in times if tm.strftime('%H:%M') <= now_str)
+            st.markdown(slot_buttons_html(times, book_date, expired_count, tenant.slug), unsafe_allow_html=True)
             st.caption("Tip: pick a time, then fill your details below.")
             # Show chosen time below the tip if selected, with a clear button
             chosen_time = st.session_state.get('chosen_time', None)
@@ -649,6 +2342,7 @@ with cal_tab:
                 with col_clear:
                     if st.button("Clear", key="clear_chosen_time"):
                         st.session_state['chosen_time'] = None
+                        release_hold(hold_session)
                         st.rerun()
 
         # Anchor for quick book
@@ -660,29 +2354,6 @@ with cal_tab:
         # Quick booking form right in the calendar tab
         # Only show the waitlist form if not already inside a form
         # Multi-select for services
-        # Always show all services in the specified order, regardless of DB content
-        service_options = [
-            "Men's Haircut (Rs 100)",
-            "Kids' Haircut (under 15) (Rs 75)",
-            "Seniors' Cut (Rs 75)",
-            "Beard Trim (Rs 50)",
-            "Shave Normal (Rs 25)",
-            "Hair color / Dry (Rs 25)",
-            "Haircut + hair color/Dry (Rs 125)",
-            "Haircut + Beard Trim (Rs 150)",
-            "Haircut + Shave + hair color/Dry (Rs 175)",
-        ]
-        name_map = {
-            "Men's Haircut (Rs 100)": "Men's Haircut",
-            "Kids' Haircut (under 15) (Rs 75)": "Kids' Haircut (under 15)",
-            "Seniors' Cut (Rs 75)": "Seniors' Cut",
-            "Beard Trim (Rs 50)": "Beard Trim",
-            "Shave Normal (Rs 25)": "Shave Normal",
-            "Hair color / Dry (Rs 25)": "Hair color / Dry",
-            "Haircut + hair color/Dry (Rs 125)": "Haircut + hair color/Dry",
-            "Haircut + Beard Trim (Rs 150)": "Haircut + Beard Trim",
-            "Haircut + Shave + hair color/Dry (Rs 175)": "Haircut + Shave + hair color/Dry",
-        }
         # Use a stable key for the multiselect widget
         selected_services = st.multiselect(
             "Select service(s)",
@@ -690,6 +2361,16 @@ with cal_tab:
             default=st.session_state.get('selected_services_default', []),
             key="cal_services"
         )
+        # Changing the services can change the length; hold the chosen time again for the new one
+        chosen_time = st.session_state.get('chosen_time', None)
+        if chosen_time and st.session_state.get('held_service_id') != book_service_id:
+            start = datetime.strptime(chosen_time, '%H:%M').time()
+            if hold_slot(hold_session, cal_barber_id, book_service_id, book_date, start) is None:
+                st.session_state['chosen_time'] = None
+                release_hold(hold_session)
+                st.warning(f"{chosen_time} is not free for the whole of the selected service. Please pick another time.")
+            else:
+                st.session_state['held_service_id'] = book_service_id
         # Calculate prices using DB values
         total_price = 0
         if selected_services:
@@ -709,7 +2390,7 @@ with cal_tab:
         else:
             st.markdown("<span style='color:#bbb;'>No service selected.</span>", unsafe_allow_html=True)
         # Always show total
-        total_display = int(total_price) if total_price.is_integer() else total_price
+        total_display = int(total_price) if float(total_price).is_integer() else total_price
         st.markdown(f"### **Total: Rs {total_display}**", unsafe_allow_html=True)
 
         with st.form("quick_book_form"):
@@ -732,6 +2413,10 @@ with cal_tab:
             submit = st.form_submit_button("Confirm Booking", disabled=(not selected_services))
             join_waitlist_disabled = st.session_state.get('chosen_time', None) is not None or not selected_services
             join_waitlist = st.form_submit_button("JOIN WAITLIST  →", key='waitlist_submit2', disabled=join_waitlist_disabled)
+            clean_phone = ''.join([c for c in customer_phone if c.isdigit() or c=='+'])
+            # Identical submissions from this session share a key, so double taps and retries book once
+            booking_key = make_idempotency_key(st.session_state['submit_nonce'], 'booking', cal_barber_id, book_date,
+                                               default_time_str, clean_phone, selected_services[:1])
             if submit:
                 if not default_time_str:
                     st.error("Please choose a time above first.")
@@ -741,6 +2426,8 @@ with cal_tab:
                     st.error("Please select at least one service.")
                 elif book_date < today:
                     st.error("Cannot book appointments for past dates.")
+                elif lookup_submission(booking_key) is None and not allow_submission(clean_phone, client_ip()):
+                    st.error("Too many booking attempts. Please wait a couple of minutes and try again.")
                 else:
                     try:
                         start_time = datetime.strptime(default_time_str, '%H:%M').time()
@@ -759,10 +2446,12 @@ with cal_tab:
                                     barber_id=cal_barber_id,
                                     service_id=service_id,
                                     customer_name=customer_name,
-                                    customer_phone=''.join([c for c in customer_phone if c.isdigit() or c=='+']),
+                                    customer_phone=clean_phone,
                                     appt_date=book_date,
                                     start_time=start_time,
                                     notes=notes,
+                                    idempotency_key=booking_key,
+                                    session_id=hold_session,
                                 )
                                 st.success(f"✅ Booking confirmed for {book_date.strftime('%d/%m/%y')} at {default_time_str}! Ref: {appt_id[:8]}")
                                 st.balloons()
@@ -775,16 +2464,22 @@ with cal_tab:
                 if not customer_name or not customer_phone:
                     st.error("Please enter your name and phone number.")
                 else:
-                    conn = get_conn()
-                    cur = conn.cursor()
                     waitlist_note = notes
                     if default_time_str:
                         waitlist_note = f"Requested time: {default_time_str}. " + (notes or "")
-                    cur.execute('''INSERT INTO waitlist (id, name, phone, notes, requested_date, created_at) VALUES (?, ?, ?, ?, ?, ?)''',
-                        (str(uuid.uuid4()), customer_name.strip(), ''.join([c for c in customer_phone if c.isdigit() or c=='+']), waitlist_note.strip(), book_date.isoformat(), datetime.utcnow().isoformat()))
-                    conn.commit()
-                    conn.close()
-                    st.success(f"You have been added to the waitlist for {book_date.strftime('%d/%m/%y')}! We will contact you if a slot opens up.")
+                    waitlist_key = make_idempotency_key(st.session_state['submit_nonce'], 'waitlist', book_date, clean_phone)
+                    if lookup_submission(waitlist_key) is None and not allow_submission(clean_phone, client_ip()):
+                        st.error("Too many attempts. Please wait a couple of minutes and try again.")
+                    else:
+                        _, created = add_to_waitlist(customer_name, clean_phone, waitlist_note, book_date, idempotency_key=waitlist_key)
+                        if created:
+                            st.success(f"You have been added to the waitlist for {book_date.strftime('%d/%m/%y')}! We will contact you if a slot opens up.")
+                        else:
+                            st.info(f"You are already on the waitlist for {book_date.strftime('%d/%m/%y')}. We will contact you if a slot opens up.")
+    # The month on screen is done; warm its neighbours for the service being booked while the
+    # customer decides. Not on a bare import: the pool's threads would hold up its exit.
+    if st.runtime.exists():
+        prefetch_adjacent_months(cal_barber_id, book_service_id, book_date.year, book_date.month)
     with admin_tab:
         st.subheader("Owner / Admin")
         # --- DISABLED ADMIN PASSWORD CHECK FOR TESTING ---
@@ -922,12 +2617,95 @@ with cal_tab:
             services_df = get_services()
             edited_df = st.data_editor(services_df[['name', 'duration_min', 'price']], num_rows="fixed")
             if st.button("Save Service Changes"):
-                conn = get_conn()
-                cur = conn.cursor()
-                for idx, row in edited_df.iterrows():
-                    service_id = services_df.iloc[idx]['id']
-                    cur.execute("UPDATE services SET name=?, duration_min=?, price=? WHERE id=?", (row['name'], row['duration_min'], row['price'], service_id))
-                conn.commit()
-                conn.close()
-                st.success("Services updated!")
-                st.rerun()
+                try:
+                    changed, retimed, overlaps = save_services(services_df, edited_df)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.session_state['service_save_report'] = (changed, retimed, overlaps)
+                    st.rerun()
+            save_report = st.session_state.pop('service_save_report', None)
+            if save_report is not None:
+                changed, retimed, overlaps = save_report
+                if not changed:
+                    st.info("No service changes to save.")
+                else:
+                    st.success(f"Services updated! {changed} changed, {retimed} upcoming booking(s) re-timed.")
+                if not overlaps.empty:
+                    st.warning(f"{len(overlaps)} upcoming booking(s) now overlap another booking of the same barber:")
+                    st.dataframe(overlaps[['appt_date', 'start_time', 'end_time', 'customer_name',
+                                           'other_start', 'other_end', 'other_name']], hide_index=True)
+
+            st.write("### Utilization")
+            occ_cols = st.columns(2)
+            occ_range = occ_cols[0].date_input("Period", value=(date.today() - timedelta(days=OCCUPANCY_DAYS), date.today()),
+                                               format="DD/MM/YYYY", key='occupancy_range')
+            occ_barber = occ_cols[1].selectbox("Barber", ['All barbers'] + list(barbers_df['name']), key='occupancy_barber')
+            if isinstance(occ_range, (tuple, list)) and len(occ_range) == 2:
+                occ_first, occ_last = occ_range
+                occ = tenant_cached(('occupancy', occ_first, occ_last), lambda: load_occupancy(occ_first, occ_last))
+                occ_index = None if occ_barber == 'All barbers' else occ['barber_ids'].index(
+                    barbers_df.loc[barbers_df['name'] == occ_barber, 'id'].iloc[0])
+                occ_overall, occ_grid = utilization(occ, occ_index)
+                gaps = idle_gap_summary(occ, occ_index)
+                per_barber = barber_utilization(occ)
+                names = dict(zip(barbers_df['id'], barbers_df['name']))
+                st.caption(f"{occ_overall:.0%} of open chair time booked between {occ_first.strftime('%d/%m/%y')} and "
+                           f"{occ_last.strftime('%d/%m/%y')}. By barber: "
+                           + ', '.join(f"{names.get(b_id, b_id)} {u:.0%}" for b_id, u in zip(occ['barber_ids'], per_barber)))
+                st.markdown(utilization_heatmap_html(occ_grid), unsafe_allow_html=True)
+                peaks = peak_hours(occ_grid)
+                if peaks:
+                    st.caption("Peak hours: " + ', '.join(f"{WEEKDAY_LABELS[wd]} {h:02d}:00 ({u:.0%})" for wd, h, u in peaks))
+                st.caption(f"{gaps['gaps']} idle gaps, {gaps['idle_min'] / 60:.0f} idle hours, median {gaps['median_min']:.0f} min. "
+                           f"{gaps['unsellable']} gaps ({gaps['unsellable_min'] / 60:.1f} h) are shorter than the "
+                           f"shortest service ({gaps['shortest']} min) and can never be sold.")
+
+            st.write("### Backups")
+            backup_status = tenant.backup_status
+            if backup_status.get('state') == 'running':
+                total_pages = backup_status.get('pages_total') or 1
+                st.progress(min(1.0, backup_status.get('pages_done', 0) / total_pages),
+                            text=f"Backup running: {backup_status.get('pages_done', 0)}/{backup_status.get('pages_total', 0)} pages")
+            elif backup_status.get('state') == 'done':
+                st.caption(f"Last backup {backup_status['started'].strftime('%d/%m/%y %H:%M')} UTC: "
+                           f"{backup_status['pages_total']} pages, {backup_status['size'] / 1024:.0f} KB "
+                           f"in {backup_status['duration']:.2f}s")
+            elif backup_status.get('state') == 'failed':
+                st.error(f"Last backup failed: {backup_status.get('error')}")
+            if st.button("Back up now", key='backup_now_btn'):
+                with st.spinner("Backing up..."):
+                    backup_path = backup_tenant(tenant)
+                st.success(f"Backup saved to {backup_path}")
+            snapshots = list_backups(tenant)
+            if snapshots:
+                st.dataframe(pd.DataFrame({
+                    'snapshot': [os.path.basename(p) for p in snapshots],
+                    'size_kb': [round(os.path.getsize(p) / 1024) for p in snapshots],
+                }), hide_index=True)
+                st.caption("Restore with: python manage.py restore <snapshot> [--until YYYY-MM-DDTHH:MM:SS]")
+            else:
+                st.caption("No backups yet.")
+
+            st.write("### Calendar feeds")
+            st.caption("Subscribe in a phone calendar app. Feeds list the next "
+                       f"{FEED_DAYS} days and are served by " + (f"this app on port {FEED_PORT}." if FEED_PORT > 0
+                                                                  else "`python manage.py serve-feeds`."))
+            st.code('\n'.join([f"Whole shop: {FEED_URL}{feed_path()}"]
+                              + [f"{row['name']}: {FEED_URL}{feed_path(row['id'])}" for _, row in barbers_df.iterrows()]),
+                    language=None)
+
+            st.write("### Slot holds")
+            holds = hold_metrics()
+            settled = holds['holds_converted'] + holds['holds_expired'] + holds['holds_released']
+            st.caption(f"{holds['holds_placed']} holds placed, {holds['holds_refused']} refused (slot already held or booked). "
+                       f"{holds['holds_converted']} became bookings, {holds['holds_expired']} expired, {holds['holds_released']} released"
+                       + (f" ({holds['holds_converted'] / settled:.0%} conversion)" if settled else "")
+                       + f". Failed confirmations: {holds['confirm_failed']}.")
+
+            st.write("### Calendar prefetch")
+            prefetch_stats = dict(tenant.prefetch_stats)
+            read_or_wasted = prefetch_stats['hits'] + prefetch_stats['wasted']
+            st.caption(f"{prefetch_stats['months']} months warmed in the background ({prefetch_stats['entries']} cache entries): "
+                       f"{prefetch_stats['hits']} read by customers, {prefetch_stats['wasted']} wasted"
+                       + (f" ({prefetch_stats['hits'] / read_or_wasted:.0%} hit rate)" if read_or_wasted else ""))
@@ -0,0 +1,90 @@
+"""Booking latency while an online backup runs.
+
+Seeds a shop with a large appointment history, then books appointments in a
+loop with no backup, during a stepped backup (the scheduler's mode) and
+during a single-pass backup, and reports booking latency for each.
+
+    python benchmarks/bench_backup.py --rows 200000
+"""
+import argparse
+import os
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+
+from common import load_app, percentile, fmt_ms, Timer
+
+
+def seed(app, rows):
+    barber_id = app.get_barbers().iloc[0]['id']
+    service_id = app.get_services().iloc[0]['id']
+    start = date.today() - timedelta(days=rows // 10)
+    now = datetime.utcnow().isoformat()
+    batch = [
+        (str(uuid.uuid4()), barber_id, service_id, 'History', '+230000000',
+         (start + timedelta(days=i // 10)).isoformat(), f"{8 + i % 10:02d}:30", f"{9 + i % 10:02d}:00", '', now)
+        for i in range(rows)
+    ]
+    conn = app.get_conn()
+    conn.executemany(
+        "INSERT INTO appointments (id, barber_id, service_id, customer_name, customer_phone, appt_date, start_time, end_time, notes, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+    return barber_id, service_id
+
+
+def book_while(app, barber_id, service_id, first_day, busy):
+    # Book one slot after another until `busy` says the backup is over
+    latencies, d = [], first_day
+    while busy(len(latencies)):
+        for slot in app.list_time_slots(d):
+            with Timer() as t:
+                app.create_appointment(barber_id, service_id, 'Bench', '+230000001', d, slot)
+            latencies.append(t.elapsed)
+            if not busy(len(latencies)):
+                break
+        d += timedelta(days=1)
+    return latencies, d
+
+
+def report(label, latencies, extra=''):
+    print(f"{label:>20}: {len(latencies):5d} bookings  p50 {fmt_ms(percentile(latencies, 50))}  "
+          f"p95 {fmt_ms(percentile(latencies, 95))}  max {fmt_ms(max(latencies) if latencies else 0)}  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--idle-bookings', type=int, default=200)
+    args = parser.parse_args()
+    app, workdir = load_app()
+    app.BACKUP_DIR = os.path.join(workdir, 'backups')
+    tenant = app.register_tenant('bench', os.path.join(workdir, 'bench.db'))
+    app.use_tenant('bench')
+    barber_id, service_id = seed(app, args.rows)
+    print(f"seeded {args.rows} appointments, db {os.path.getsize(tenant.db_path) / 1e6:.1f} MB")
+
+    day = date.today() + timedelta(days=1)
+    latencies, day = book_while(app, barber_id, service_id, day, lambda n: n < args.idle_bookings)
+    report('no backup', latencies)
+
+    for label, pages in (('stepped backup', app.BACKUP_PAGES_PER_STEP), ('single-pass backup', -1)):
+        app.BACKUP_PAGES_PER_STEP = pages
+        done = threading.Event()
+
+        def run_backup():
+            app.use_tenant('bench')
+            app.backup_tenant(tenant)
+            done.set()
+
+        worker = threading.Thread(target=run_backup)
+        worker.start()
+        latencies, day = book_while(app, barber_id, service_id, day, lambda n: not done.is_set())
+        worker.join()
+        status = tenant.backup_status
+        report(label, latencies, f"backup {status['duration']:.2f}s, {status['pages_total']} pages")
+
+
+if __name__ == '__main__':
+    main()
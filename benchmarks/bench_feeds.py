@@ -0,0 +1,91 @@
+"""iCalendar feeds: full downloads versus conditional polls.
+
+Seeds the coming weeks, starts the feed endpoint on a free local port and
+polls it the way a phone calendar app does: one full download, then repeat
+requests with If-None-Match / If-Modified-Since. Pooled connections record
+which tables each request reads, to show that 304s never read appointments.
+A booking then has to turn the next poll back into a 200. Runs fully offline.
+
+    python benchmarks/bench_feeds.py --days 60 --fill 0.7 --polls 200
+"""
+import argparse
+import random
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+
+from common import load_app, fmt_ms, percentile, Timer
+from bench_next_available import fill
+
+
+def get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as ex:
+        return ex.code, dict(ex.headers), b''
+
+
+def watch_tables(pool, seen):
+    # Record the tables read through every idle pooled connection
+    def authorizer(action, arg1, *_):
+        if action == sqlite3.SQLITE_READ:
+            seen.add(arg1)
+        return sqlite3.SQLITE_OK
+    conns = []
+    while not pool._idle.empty():
+        conns.append(pool._idle.get_nowait())
+    for conn in conns:
+        conn.set_authorizer(authorizer)
+        pool._idle.put_nowait(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--fill', type=float, default=0.7)
+    parser.add_argument('--polls', type=int, default=200)
+    args = parser.parse_args()
+    random.seed(7)
+    app, _ = load_app()
+    tenant = app.use_tenant('main')
+    print(f"seeded {fill(app, args.days, args.fill, app.datetime.now())} appointments over {args.days} days")
+    server = app.make_feed_server('127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    barber_id = app.get_barbers().iloc[0]['id']
+
+    for label, path in (('shop', app.feed_path()), ('barber', app.feed_path(barber_id))):
+        with Timer() as t:
+            status, headers, body = get(base + path)
+        print(f"{label:>6} feed: {status}, {len(body) / 1024:.0f} KB, {body.count(b'BEGIN:VEVENT')} events in {fmt_ms(t.elapsed)}")
+
+    path = app.feed_path(barber_id)
+    status, headers, _ = get(base + path)
+    etag, modified = headers['ETag'], headers['Last-Modified']
+    seen = set()
+    watch_tables(tenant.pool, seen)
+    for label, conditional in (('If-None-Match', {'If-None-Match': etag}), ('If-Modified-Since', {'If-Modified-Since': modified})):
+        timings, statuses = [], set()
+        for _ in range(args.polls):
+            with Timer() as t:
+                status, _, _ = get(base + path, conditional)
+            timings.append(t.elapsed)
+            statuses.add(status)
+        print(f"{label:>17}: {sorted(statuses)} p50 {fmt_ms(percentile(timings, 50))} p95 {fmt_ms(percentile(timings, 95))}")
+    print(f"tables read while answering conditional polls: {sorted(seen)}")
+
+    service_id = app.get_services().iloc[0]['id']
+    d, start, _ = app.next_available_slots(service_id, count=1, barber_id=barber_id)[0]
+    app.create_appointment(barber_id, service_id, 'New customer', '+230', d, start)
+    status, headers, body = get(base + path, {'If-None-Match': etag})
+    print(f"after a booking: {status}, new ETag {headers.get('ETag')} (was {etag}), {body.count(b'BEGIN:VEVENT')} events")
+    status, _, _ = get(base + path.replace('token=', 'token=x'))
+    print(f"bad token: {status}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
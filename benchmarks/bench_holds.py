@@ -0,0 +1,82 @@
+"""Failed confirmations with and without slot holds under contention.
+
+Many customers open the same day at once, each picks a free slot, spends a
+while on the form, then confirms. Without holds, two customers can fill in
+the form for the same slot and the slower one is rejected at the end. With
+holds, the second customer is told at pick time and picks again straight away.
+
+    python benchmarks/bench_holds.py --customers 40 --think 0.2
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from common import load_app, fmt_ms, percentile
+
+
+def customer(app, use_holds, barber_id, service_id, d, think, results, lock):
+    app.use_tenant('main')
+    session_id = uuid.uuid4().hex
+    picks = confirms = 0
+    started = time.perf_counter()
+    while True:
+        times = app.open_start_times(barber_id, service_id, d, session_id) if use_holds \
+            else app.cached_start_times(barber_id, service_id, d)
+        if not times:
+            outcome = 'day full'
+            break
+        start = random.choice(times[:3])  # everyone wants the morning
+        picks += 1
+        if use_holds and app.hold_slot(session_id, barber_id, service_id, d, start) is None:
+            continue
+        time.sleep(think)  # filling in name and phone
+        confirms += 1
+        try:
+            app.create_appointment(barber_id, service_id, 'Bench', '+230', d, start,
+                                   session_id=session_id if use_holds else None)
+            outcome = 'booked'
+            break
+        except ValueError:
+            continue
+    with lock:
+        results.append((outcome, picks, confirms - (outcome == 'booked'), time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=40)
+    parser.add_argument('--think', type=float, default=0.2, help="seconds spent on the form after picking")
+    args = parser.parse_args()
+    random.seed(7)
+    app, _ = load_app()
+    app.use_tenant('main')
+    barber_id = app.get_barbers().iloc[0]['id']
+    service_id = app.get_services().iloc[0]['id']
+    d = date.today() + timedelta(days=1)
+    while not app.list_time_slots(d):
+        d += timedelta(days=1)
+
+    for label, use_holds in (('no holds', False), ('holds', True)):
+        d += timedelta(days=1)
+        while not app.list_time_slots(d):
+            d += timedelta(days=1)
+        results, lock = [], threading.Lock()
+        threads = [threading.Thread(target=customer, args=(app, use_holds, barber_id, service_id, d, args.think, results, lock))
+                   for _ in range(args.customers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        booked = sum(1 for r in results if r[0] == 'booked')
+        failed = sum(r[2] for r in results)
+        print(f"{label:>8}: {booked} booked, {failed} failed confirmations, {sum(r[1] for r in results)} picks, "
+              f"time to outcome p50 {fmt_ms(percentile([r[3] for r in results], 50))} "
+              f"p95 {fmt_ms(percentile([r[3] for r in results], 95))}")
+    print(f"hold metrics: {app.hold_metrics()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Earliest-slot search over a multi-day horizon.
+
+Fills the next weeks of a shop almost completely, then times
+next_available_slots against walking the same horizon day by day through
+available_start_times, and checks both agree.
+
+    python benchmarks/bench_next_available.py --days 60 --fill 0.9
+"""
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from common import load_app, fmt_ms, Timer
+
+
+def fill(app, days, ratio, start):
+    barbers = list(app.get_barbers()['id'])
+    rows = []
+    for offset in range(days):
+        d = (start + timedelta(days=offset)).date()
+        for b_id in barbers:
+            for s in app.list_time_slots(d):
+                if random.random() < ratio:
+                    end = (datetime.combine(d, s) + timedelta(minutes=60)).time()
+                    rows.append((str(uuid.uuid4()), b_id, 'seed', 'Seed', '+230', d.isoformat(),
+                                 s.strftime('%H:%M'), end.strftime('%H:%M'), '', datetime.utcnow().isoformat()))
+    conn = app.get_conn()
+    conn.executemany(
+        "INSERT INTO appointments (id, barber_id, service_id, customer_name, customer_phone, appt_date, start_time, end_time, notes, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def day_by_day(app, barber_id, service_id, days, start, count):
+    found = []
+    for offset in range(days):
+        d = (start + timedelta(days=offset)).date()
+        for s in app.available_start_times(barber_id, service_id, d):
+            if datetime.combine(d, s) > start.replace(second=59, microsecond=0):
+                found.append((d, s))
+                if len(found) >= count:
+                    return found
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--fill', type=float, default=0.97)
+    parser.add_argument('--count', type=int, default=5)
+    args = parser.parse_args()
+    random.seed(7)
+    app, _ = load_app()
+    app.use_tenant('main')
+    start = datetime.now()
+    print(f"seeded {fill(app, args.days, args.fill, start)} appointments over {args.days} days")
+    barber_id = app.get_barbers().iloc[0]['id']
+    service_id = app.get_services().iloc[0]['id']
+
+    runs = []
+    for _ in range(20):
+        with Timer() as t:
+            fast = app.next_available_slots(service_id, count=args.count, days=args.days, barber_id=barber_id, after=start)
+        runs.append(t.elapsed)
+    with Timer() as any_barber:
+        app.next_available_slots(service_id, count=args.count, days=args.days, after=start)
+    with Timer() as slow:
+        slow_result = day_by_day(app, barber_id, service_id, args.days, start, args.count)
+    print(f"next_available_slots: best {fmt_ms(min(runs))}, median {fmt_ms(sorted(runs)[len(runs) // 2])}; "
+          f"any barber {fmt_ms(any_barber.elapsed)}")
+    print(f"day-by-day available_start_times: {fmt_ms(slow.elapsed)}")
+    print(f"results agree: {[(d, s) for d, s, _ in fast] == slow_result} ({len(fast)} slots, first {fast[0][:2] if fast else None})")
+
+
+if __name__ == '__main__':
+    main()
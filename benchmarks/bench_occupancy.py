@@ -0,0 +1,106 @@
+"""Occupancy matrix over a year of history.
+
+Seeds a year of past bookings and some unavailability for every barber,
+then times load_occupancy plus the utilization, peak-hour and idle-gap
+analysis. A plain Python minute-by-minute count over a few weeks checks the
+numbers.
+
+    python benchmarks/bench_occupancy.py --days 365 --fill 0.7
+"""
+import argparse
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+from common import load_app, fmt_ms, Timer
+
+
+def seed(app, first, days, ratio):
+    barbers = list(app.get_barbers()['id'])
+    services = app.get_services()
+    appointments, away = [], []
+    for offset in range(days):
+        d = first + timedelta(days=offset)
+        for b_id in barbers:
+            if random.random() < 0.03:
+                away.append((str(uuid.uuid4()), b_id, d.isoformat(), None, None, 'day off'))
+                continue
+            for s in app.list_time_slots(d):
+                if random.random() < ratio:
+                    svc = services.sample(1).iloc[0]
+                    end = (datetime.combine(d, s) + timedelta(minutes=int(svc['duration_min']))).time()
+                    appointments.append((str(uuid.uuid4()), b_id, svc['id'], 'Seed', '+230', d.isoformat(),
+                                         s.strftime('%H:%M'), end.strftime('%H:%M'), '', datetime.utcnow().isoformat()))
+    conn = app.get_conn()
+    conn.executemany("INSERT INTO appointments (id, barber_id, service_id, customer_name, customer_phone, appt_date, "
+                     "start_time, end_time, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", appointments)
+    conn.executemany("INSERT INTO barber_unavailability (id, barber_id, date, start_time, end_time, reason) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", away)
+    conn.commit()
+    conn.close()
+    return len(appointments), len(away)
+
+
+def naive_utilization(app, barber_id, first, last):
+    # Minute by minute in plain Python, straight from the tables
+    booked = open_ = 0
+    conn = app.get_conn()
+    d = first
+    while d <= last:
+        hours = app.WORKING_HOURS.get(app.weekday_key(d))
+        away = conn.execute("SELECT start_time, end_time FROM barber_unavailability WHERE barber_id=? AND date=?",
+                            (barber_id, d.isoformat())).fetchall()
+        appts = conn.execute("SELECT start_time, end_time FROM appointments WHERE barber_id=? AND appt_date=?",
+                             (barber_id, d.isoformat())).fetchall()
+        for minute in range(24 * 60):
+            t = f"{minute // 60:02d}:{minute % 60:02d}"
+            if not hours or not (hours[0].strftime('%H:%M') <= t < hours[1].strftime('%H:%M')):
+                continue
+            if any(b[0].strftime('%H:%M') <= t < b[1].strftime('%H:%M') for b in app.BREAKS):
+                continue
+            if any((s or '00:00') <= t < (e or '24:00') for s, e in away):
+                continue
+            open_ += 1
+            booked += any(s <= t < e for s, e in appts)
+        d += timedelta(days=1)
+    conn.close()
+    return booked / open_ if open_ else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--fill', type=float, default=0.7)
+    args = parser.parse_args()
+    random.seed(7)
+    app, _ = load_app()
+    app.use_tenant('main')
+    last = date.today() - timedelta(days=1)
+    first = last - timedelta(days=args.days - 1)
+    n_appts, n_away = seed(app, first, args.days, args.fill)
+    print(f"seeded {n_appts} appointments and {n_away} days off for {len(app.get_barbers())} barbers over {args.days} days")
+
+    runs = []
+    for _ in range(5):
+        with Timer() as t:
+            occ = app.load_occupancy(first, last)
+            overall, grid = app.utilization(occ)
+            per_barber = app.barber_utilization(occ)
+            peaks = app.peak_hours(grid)
+            gaps = app.idle_gap_summary(occ)
+        runs.append(t.elapsed)
+    print(f"occupancy + analysis: best {fmt_ms(min(runs))}, median {fmt_ms(sorted(runs)[2])} "
+          f"(matrix {occ['booked'].shape} of {app.OCCUPANCY_BIN_MIN}-minute bins)")
+    print(f"utilization {overall:.1%}; per barber {', '.join(f'{u:.1%}' for u in per_barber)}")
+    print(f"peaks: {', '.join(f'{app.WEEKDAY_LABELS[wd]} {h:02d}:00 {u:.0%}' for wd, h, u in peaks)}")
+    print(f"idle gaps: {gaps}")
+
+    check_first = last - timedelta(days=27)
+    sub = app.load_occupancy(check_first, last)
+    fast = app.barber_utilization(sub)[0]
+    slow = naive_utilization(app, sub['barber_ids'][0], check_first, last)
+    print(f"last 4 weeks, first barber: numpy {fast:.4%} vs naive {slow:.4%} -> {'match' if abs(fast - slow) < 1e-9 else 'MISMATCH'}")
+
+
+if __name__ == '__main__':
+    main()
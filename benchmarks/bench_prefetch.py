@@ -0,0 +1,73 @@
+"""Day picks across months with and without background prefetch of adjacent months.
+
+A customer picks a few days in one month, then moves on to the next, pausing
+on each pick. Every pick goes through the calls the calendar tab makes:
+open_start_times for the picked day, then prefetch_adjacent_months. Without
+prefetch each pick computes the day's availability while they wait; with
+prefetch the days of the next month were warmed during the pauses. Optional
+bookings between months show how much prefetched work goes stale.
+
+    python benchmarks/bench_prefetch.py --months 6 --picks 3 --think 0.5 [--book-every 2]
+"""
+import argparse
+import calendar
+import random
+import time
+from datetime import date, datetime
+
+from common import load_app, fmt_ms, percentile, Timer
+from bench_next_available import fill
+
+
+def pick_days(app, barber_id, service_id, months, picks, think, book_every, prefetch):
+    y, m = date.today().year, date.today().month
+    first, later = [], []
+    for i in range(months):
+        days = [d for d in calendar.Calendar().itermonthdates(y, m) if d.month == m and d >= date.today()]
+        for d in sorted(random.sample(days, min(picks, len(days)))):
+            with Timer() as t:
+                times = app.open_start_times(barber_id, service_id, d, 'bench-session')
+            (first if i == 0 else later).append(t.elapsed)
+            if prefetch:
+                app.prefetch_adjacent_months(barber_id, service_id, d.year, d.month)
+            time.sleep(think)
+        if book_every and i % book_every == book_every - 1 and times:
+            app.create_appointment(barber_id, service_id, 'Walk-in', '+230', d, times[-1])
+        y, m = (y, m + 1) if m < 12 else (y + 1, 1)
+    return first, later
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--picks', type=int, default=3, help="days looked at in each month")
+    parser.add_argument('--think', type=float, default=0.5, help="seconds spent looking at each day")
+    parser.add_argument('--fill', type=float, default=0.6)
+    parser.add_argument('--book-every', type=int, default=0, help="book a slot after every N months (0: never)")
+    args = parser.parse_args()
+    app, _ = load_app()
+    tenant = app.use_tenant('main')
+    start = datetime.now()
+    horizon = (args.months + 1) * 31
+    random.seed(7)
+    print(f"seeded {fill(app, horizon, args.fill, start)} appointments over {horizon} days")
+    barber_id = app.get_barbers().iloc[0]['id']
+    service_id = app.get_services().iloc[0]['id']
+
+    for label, prefetch in (('no prefetch', False), ('prefetch', True)):
+        random.seed(11)  # both runs pick the same days
+        with tenant.cache_lock:
+            tenant.cache.clear()
+            tenant.prefetched.clear()
+        first, later = pick_days(app, barber_id, service_id, args.months, args.picks, args.think,
+                                 args.book_every, prefetch)
+        # The first month is never warm
+        print(f"{label:>12}: first month p50 {fmt_ms(percentile(first, 50))}, later months p50 "
+              f"{fmt_ms(percentile(later, 50))} max {fmt_ms(max(later, default=0))}")
+    stats = tenant.prefetch_stats
+    print(f"prefetch: {stats['months']} months, {stats['entries']} entries warmed, "
+          f"{stats['hits']} hits, {stats['wasted']} wasted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Month-grid, slot-button and price-list rendering: cost and payload size.
+
+Compares the previous inline-style markup (reproduced below as a baseline)
+with the class-based fragments, and a cold render with a repeat view that
+reads the cached availability.
+
+    python benchmarks/bench_render.py
+"""
+from datetime import date, timedelta
+
+from common import load_app, fmt_ms, Timer
+
+LEGACY_SLOT = ('<form action="" method="get" style="margin:0 0 12px 0;padding:0;display:inline;">\n'
+               '                    <button name="pick_time" value="{t}" style="background:#18191a;color:#fff;'
+               'border:1.5px solid #888;border-radius:10px;font-size:1em;padding:0.15em 1.5em;margin:0;min-width:90px;'
+               'min-height:48px;cursor:pointer;display:inline-block;">{t}</button></form>')
+
+
+def legacy_slot_buttons_html(times):
+    btn_html = '<div style="display:flex;flex-wrap:wrap;gap:16px 24px;">'
+    for tm in times:
+        btn_html += LEGACY_SLOT.format(t=tm.strftime('%H:%M'))
+    return btn_html + '</div>'
+
+
+def legacy_month_grid_html(app, y, m, enabled):
+    table_html = '<div class="calendar-wrapper"><table style="width:100%; min-width:420px;"><thead><tr>'
+    for w in app.WEEKDAY_LABELS:
+        table_html += f'<th>{w}</th>'
+    table_html += '</tr></thead><tbody>'
+    for week in app.cal.Calendar(firstweekday=0).monthdatescalendar(y, m):
+        table_html += '<tr>'
+        for d in week:
+            if d in enabled:
+                btn = f'<button onclick="window.location.search=window.location.search+`&pick={d.isoformat()}`" class="calendar-btn">{d.day}</button>'
+            else:
+                btn = f'<div class="calendar-cell disabled">{d.day}</div>'
+            table_html += f'<td style="padding:0;">{btn}</td>'
+        table_html += '</tr>'
+    return table_html + '</tbody></table></div>'
+
+
+def main():
+    app, _ = load_app()
+    app.use_tenant('main')
+    barber_id = app.get_barbers().iloc[0]['id']
+    service_id = app.get_services().iloc[0]['id']
+    nxt = date.today().replace(day=1) + timedelta(days=32)
+    y, m = nxt.year, nxt.month
+
+    with Timer() as cold:
+        enabled = app.month_available_days(barber_id, service_id, y, m)
+        grid = app.month_grid_html(y, m, enabled)
+    with Timer() as warm:
+        enabled = app.month_available_days(barber_id, service_id, y, m)
+        grid = app.month_grid_html(y, m, enabled)
+    with Timer() as markup:
+        app.month_grid_html(y, m, enabled)
+    print(f"month grid: cold {fmt_ms(cold.elapsed)}, repeat view {fmt_ms(warm.elapsed)} "
+          f"(markup alone {fmt_ms(markup.elapsed)})")
+
+    day = enabled[0]
+    times = app.cached_start_times(barber_id, service_id, day)
+    legacy_grid = legacy_month_grid_html(app, y, m, set(enabled))
+    slots = app.slot_buttons_html(times, day, 0, 'main')
+    legacy_slots = legacy_slot_buttons_html(times)
+    prices = app.price_list_html(app.get_services())
+    print(f"month grid html: {len(legacy_grid.encode())} -> {len(grid.encode())} bytes")
+    print(f"slot buttons html ({len(times)} slots): {len(legacy_slots.encode())} -> {len(slots.encode())} bytes")
+    print(f"price list html: {len(prices.encode())} bytes")
+
+
+if __name__ == '__main__':
+    main()
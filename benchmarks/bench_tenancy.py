@@ -0,0 +1,110 @@
+"""Many shops in one process: per-shop SQLite files vs one shared file.
+
+Each worker thread books appointments and reads availability. With tenancy
+every worker writes to its own shop's database; the shared run points every
+worker at one file for contrast. Before each booking the worker also takes
+and releases its file's write lock (BEGIN IMMEDIATE) on a separate
+connection, so the time spent waiting for other writers is measured
+directly rather than inferred from overall latency. In one process the
+threads share the GIL, so throughput and read+book latency are bound by the
+Python work and stay about the same either way; separate files show up in the
+lock waits and the booking write tail.
+
+    python benchmarks/bench_tenancy.py --shops 8 --bookings 60
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from common import load_app, percentile, fmt_ms, Timer
+
+
+def wait_for_write_lock(conn):
+    # Seconds until this connection holds the file's write lock, or None on timeout
+    with Timer() as t:
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError:
+            return None
+    return t.elapsed
+
+
+def worker(app, slug, worker_idx, bookings, stats, lock):
+    tenant = app.use_tenant(slug)
+    probe = sqlite3.connect(tenant.db_path, timeout=app.BUSY_TIMEOUT_SEC, isolation_level=None)
+    barber_id = app.get_barbers().iloc[0]['id']
+    service_id = app.get_services().iloc[0]['id']
+    latencies, writes, lock_waits, lock_errors = [], [], [], 0
+    d = date.today() + timedelta(days=1 + worker_idx * 400)
+    done = 0
+    while done < bookings:
+        for slot in app.list_time_slots(d):
+            if done >= bookings:
+                break
+            waited = wait_for_write_lock(probe)
+            if waited is None:
+                lock_errors += 1
+            else:
+                lock_waits.append(waited)
+            with Timer() as t:
+                app.available_start_times(barber_id, service_id, d)
+                with Timer() as w:
+                    try:
+                        app.create_appointment(barber_id, service_id, f"Bench {worker_idx}", "+230000000", d, slot)
+                    except sqlite3.OperationalError:
+                        lock_errors += 1
+                    except ValueError:
+                        pass
+            latencies.append(t.elapsed)
+            writes.append(w.elapsed)
+            done += 1
+        d += timedelta(days=1)
+    probe.close()
+    with lock:
+        stats['latencies'].extend(latencies)
+        stats['writes'].extend(writes)
+        stats['lock_waits'].extend(lock_waits)
+        stats['lock_errors'] += lock_errors
+
+
+def run(app, workdir, shops, bookings, shared):
+    slugs = []
+    for i in range(shops):
+        slug = f"{'shared' if shared else 'shop'}{i}"
+        db_file = 'shared.db' if shared else f"{slug}.db"
+        app.register_tenant(slug, os.path.join(workdir, db_file))
+        slugs.append(slug)
+    for slug in slugs:
+        app.use_tenant(slug)
+    stats, lock = {'latencies': [], 'writes': [], 'lock_waits': [], 'lock_errors': 0}, threading.Lock()
+    threads = [threading.Thread(target=worker, args=(app, slug, i, bookings, stats, lock)) for i, slug in enumerate(slugs)]
+    with Timer() as wall:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    lat, writes, waits = stats['latencies'], stats['writes'], stats['lock_waits']
+    label = 'one shared DB' if shared else 'per-shop DBs'
+    print(f"{label:>14}: {len(lat)} ops in {wall.elapsed:.2f}s ({len(lat) / wall.elapsed:.0f} ops/s)\n"
+          f"{'':>16}read+book p50 {fmt_ms(percentile(lat, 50))}  p95 {fmt_ms(percentile(lat, 95))}\n"
+          f"{'':>16}booking write p50 {fmt_ms(percentile(writes, 50))}  p95 {fmt_ms(percentile(writes, 95))}  "
+          f"p99 {fmt_ms(percentile(writes, 99))}\n"
+          f"{'':>16}write-lock wait p50 {fmt_ms(percentile(waits, 50))}  p95 {fmt_ms(percentile(waits, 95))}  "
+          f"p99 {fmt_ms(percentile(waits, 99))}  total {sum(waits):.2f}s  lock errors {stats['lock_errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shops', type=int, default=8)
+    parser.add_argument('--bookings', type=int, default=60, help='bookings per shop')
+    args = parser.parse_args()
+    app, workdir = load_app()
+    run(app, workdir, args.shops, args.bookings, shared=False)
+    run(app, workdir, args.shops, args.bookings, shared=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Booking and waitlist write path under abusive load.
+
+A bot hammers the waitlist from one IP with retries of the same form and with
+fresh fake phone numbers, interleaved with real customers. Reports the cost
+of a rejected submission (rate limit / idempotent replay / duplicate
+lookup) next to a real write, and how many rows actually landed. Customers
+arrive spread over --minutes of simulated time; with --shared-ip they all come
+from one address, as behind shop Wi-Fi or carrier NAT.
+
+    python benchmarks/bench_throttle.py --bot 5000 --customers 200 [--minutes 60] [--shared-ip]
+"""
+import argparse
+from time import monotonic
+from datetime import date, timedelta
+
+from common import load_app, percentile, fmt_ms, Timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bot', type=int, default=5000, help='bot submissions')
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--minutes', type=float, default=60, help="simulated time over which customers arrive")
+    parser.add_argument('--shared-ip', action='store_true', help="real customers share one address")
+    args = parser.parse_args()
+    app, _ = load_app()
+    app.use_tenant('main')
+    nonce = 'bench-session'
+    day = date.today() + timedelta(days=3)
+    denied, replayed, real = [], [], []
+    bot_every = max(1, args.bot // max(1, args.customers))
+    customer = refused = 0
+    start, spacing = monotonic(), args.minutes * 60 / max(1, args.customers)
+    for i in range(args.bot):
+        # Bot from one IP: identical retries of one form, alternating with fresh fake phone numbers
+        phone = '+2305000000' if i % 2 else f"+2307{i:07d}"
+        key = app.make_idempotency_key(nonce, 'waitlist', day, phone)
+        with Timer() as t:
+            if app.lookup_submission(key) is None and not app.allow_submission(phone, '10.0.0.66'):
+                outcome = denied
+            else:
+                app.add_to_waitlist('Bot', phone, '', day, idempotency_key=key)
+                outcome = replayed
+        outcome.append(t.elapsed)
+        if i % bot_every == 0 and customer < args.customers:
+            phone = f"+2306{customer:07d}"
+            key = app.make_idempotency_key(f"customer-{customer}", 'waitlist', day, phone)
+            ip = '10.1.0.1' if args.shared_ip else f"10.1.{customer // 250}.{customer % 250}"
+            with Timer() as t:
+                if app.lookup_submission(key) is None and app.allow_submission(phone, ip, now=start + customer * spacing):
+                    app.add_to_waitlist('Customer', phone, '', day, idempotency_key=key)
+                else:
+                    refused += 1
+            real.append(t.elapsed)
+            customer += 1
+    rows = app.fetch_df("SELECT COUNT(*) AS n FROM waitlist").iloc[0]['n']
+    for label, samples in (('bot rate-limited', denied), ('bot replay/accepted', replayed), ('real customer write', real)):
+        print(f"{label:>20}: {len(samples):6d}  p50 {fmt_ms(percentile(samples, 50))}  p95 {fmt_ms(percentile(samples, 95))}")
+    print(f"waitlist rows written: {rows} ({customer - refused} of {customer} customers, {refused} refused)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import time
+import importlib
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(workdir: str = None):
+    # Import Appointment.py in Streamlit "bare mode" inside a scratch directory,
+    # so the one-off UI pass never touches the real barber_shop.db.
+    workdir = workdir or tempfile.mkdtemp(prefix='barber-bench-')
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    os.environ['BARBER_TENANTS_FILE'] = os.path.join(workdir, 'tenants.json')
+    os.chdir(workdir)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return importlib.import_module('Appointment'), workdir
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} ms"
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,221 @@
+"""Concurrent-session load harness for Appointment.py, built on Streamlit AppTest.
+
+Runs many simulated customer and admin sessions in parallel against one scratch
+copy of the shop database. Each session reruns the real script headlessly: it
+browses dates across months, picks a time (?pick_time=), submits
+quick_book_form, or works the admin tab. AppTest drives a process-global
+Streamlit runtime, so every session runs in its own worker process; in-process
+caches and connection pools are therefore per session, as with several server
+processes sharing one database file.
+
+A probe thread repeatedly takes the SQLite write lock (BEGIN IMMEDIATE) and
+records how long it had to wait, which is what any booking write would see.
+Runs fully offline.
+
+    python benchmarks/load_test.py --sessions 16 --actions 25
+    python benchmarks/load_test.py --db /path/to/copy-of-barber_shop.db
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+from collections import defaultdict
+from datetime import date, timedelta
+
+import streamlit.logger
+
+from common import ROOT, percentile, fmt_ms, Timer
+
+APP_PATH = os.path.join(ROOT, 'Appointment.py')
+PICK_TIME_RE = re.compile(r'name="pick_time" value="(\d\d:\d\d)"')
+SERVICE_OPTION = "Men's Haircut (Rs 100)"
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)  # action -> rerun seconds
+        self.outcomes = defaultdict(int)  # 'booked', 'slot_taken', 'script_error', ...
+        self.lock_waits = []
+
+    def record(self, action, seconds, outcome=None):
+        with self.lock:
+            if action:
+                self.latency[action].append(seconds)
+            if outcome:
+                self.outcomes[outcome] += 1
+
+    def merge(self, latency, outcomes):
+        with self.lock:
+            for action, samples in latency.items():
+                self.latency[action].extend(samples)
+            for outcome, n in outcomes.items():
+                self.outcomes[outcome] += n
+
+
+def rerun(at, stats, action):
+    with Timer() as t:
+        at.run()
+    outcome = None
+    if at.exception:
+        outcome = 'script_error'
+    stats.record(action, t.elapsed, outcome)
+    return outcome is None
+
+
+def browse(at, stats, rng):
+    # Jump to a date up to three months out, like paging through the calendar
+    target = date.today() + timedelta(days=rng.randint(0, 90))
+    at.date_input(key='date_input_main').set_value(target)
+    rerun(at, stats, 'browse_date')
+
+
+def pick_time(at, stats, rng):
+    times = [t for m in at.markdown for t in PICK_TIME_RE.findall(m.value)]
+    if not times:
+        browse(at, stats, rng)
+        return
+    at.query_params['pick_time'] = rng.choice(times)
+    rerun(at, stats, 'pick_time')
+
+
+def book(at, stats, rng, idx):
+    if 'chosen_time' not in at.session_state or not at.session_state['chosen_time']:
+        pick_time(at, stats, rng)
+    if at.multiselect(key='cal_services').value != [SERVICE_OPTION]:
+        # Confirm Booking stays disabled until the service choice has rerun the script
+        at.multiselect(key='cal_services').set_value([SERVICE_OPTION])
+        if not rerun(at, stats, 'select_service'):
+            return
+    at.text_input(key='cal_name').input(f"Load {idx}")
+    at.text_input(key='cal_phone').input(f"+2305{idx:07d}")
+    submit = next(b for b in at.button if b.label == 'Confirm Booking')
+    submit.click()
+    if not rerun(at, stats, 'submit_booking'):
+        return
+    errors = ' '.join(e.value for e in at.error)
+    if any('Booking confirmed' in s.value for s in at.success):
+        stats.record(None, 0, 'booked')
+    elif 'no longer available' in errors:
+        stats.record(None, 0, 'slot_taken')
+    elif errors:
+        stats.record(None, 0, 'form_error')
+    at.session_state['chosen_time'] = None
+
+
+def admin(at, stats, rng):
+    at.date_input(key='admin_date_input').set_value(date.today() + timedelta(days=rng.randint(0, 30)))
+    rerun(at, stats, 'admin_view')
+
+
+def warm_up():
+    from streamlit.testing.v1 import AppTest
+    streamlit.logger.set_log_level('error')
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.run()
+    return at.exception[0].message if at.exception else None
+
+
+def session(idx, actions, seed):
+    # Runs in a worker process; returns plain dicts for the parent to merge
+    from streamlit.testing.v1 import AppTest
+    streamlit.logger.set_log_level('error')
+    stats, rng = Stats(), random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    if not rerun(at, stats, 'first_load'):
+        return dict(stats.latency), dict(stats.outcomes)
+    for _ in range(actions):
+        roll = rng.random()
+        try:
+            if roll < 0.35:
+                browse(at, stats, rng)
+            elif roll < 0.6:
+                pick_time(at, stats, rng)
+            elif roll < 0.85:
+                book(at, stats, rng, idx)
+            else:
+                admin(at, stats, rng)
+        except Exception as ex:  # a widget the scenario expected was not rendered
+            stats.record(None, 0, f'harness_error:{type(ex).__name__}')
+    return dict(stats.latency), dict(stats.outcomes)
+
+
+def lock_probe(db_path, stats, stop, interval):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    while not stop.wait(interval):
+        with Timer() as t:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('COMMIT')
+            except sqlite3.OperationalError:
+                stats.record(None, 0, 'probe_lock_timeout')
+                continue
+        with stats.lock:
+            stats.lock_waits.append(t.elapsed)
+    conn.close()
+
+
+def report(stats, wall, sessions):
+    reruns = sum(len(v) for v in stats.latency.values())
+    print(f"{sessions} sessions, {reruns} reruns in {wall:.1f}s ({reruns / wall:.1f} reruns/s)")
+    print(f"{'action':>16} {'n':>6} {'p50':>10} {'p95':>10} {'p99':>10}")
+    everything = []
+    for action in sorted(stats.latency):
+        lat = stats.latency[action]
+        everything.extend(lat)
+        print(f"{action:>16} {len(lat):6d} {fmt_ms(percentile(lat, 50)):>10} {fmt_ms(percentile(lat, 95)):>10} "
+              f"{fmt_ms(percentile(lat, 99)):>10}")
+    print(f"{'all':>16} {len(everything):6d} {fmt_ms(percentile(everything, 50)):>10} "
+          f"{fmt_ms(percentile(everything, 95)):>10} {fmt_ms(percentile(everything, 99)):>10}")
+    waits = stats.lock_waits
+    print(f"write-lock wait ({len(waits)} probes): p50 {fmt_ms(percentile(waits, 50))}  "
+          f"p95 {fmt_ms(percentile(waits, 95))}  p99 {fmt_ms(percentile(waits, 99))}  max {fmt_ms(max(waits) if waits else 0)}")
+    failures = sum(n for k, n in stats.outcomes.items() if k not in ('booked', 'slot_taken'))
+    print(f"outcomes: {dict(sorted(stats.outcomes.items()))}")
+    print(f"failure rate: {failures / max(1, reruns):.2%} of reruns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--actions', type=int, default=25, help='actions per session')
+    parser.add_argument('--db', help='existing shop database to copy and load (default: fresh database)')
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='barber-load-')
+    os.chdir(workdir)
+    os.environ['BARBER_TENANTS_FILE'] = os.path.join(workdir, 'tenants.json')
+    os.environ['BARBER_BACKUP_INTERVAL_MIN'] = '0'
+    if args.db:
+        shutil.copyfile(args.db, os.path.join(workdir, 'barber_shop.db'))
+    stats = Stats()
+    # spawn, not fork: AppTest swaps sys.modules['__main__'] and a global runtime,
+    # so the parent never runs the app itself
+    with multiprocessing.get_context('spawn').Pool(args.sessions) as pool:
+        error = pool.apply(warm_up)  # creates and migrates the database before the probe opens it
+        if error:
+            raise SystemExit(f"App failed to start: {error}")
+        stop = threading.Event()
+        probe = threading.Thread(target=lock_probe, args=(os.path.join(workdir, 'barber_shop.db'), stats, stop, args.probe_interval))
+        probe.start()
+        jobs = [(i, args.actions, args.seed * 1000 + i) for i in range(args.sessions)]
+        with Timer() as wall:
+            for latency, outcomes in pool.starmap(session, jobs):
+                stats.merge(latency, outcomes)
+        stop.set()
+        probe.join()
+    report(stats, wall.elapsed, args.sessions)
+
+
+if __name__ == '__main__':
+    # Re-import under the module name so workers unpickle load_test.session even
+    # after AppTest has replaced their __main__ with Appointment.py
+    import load_test
+    load_test.main()
@@ -0,0 +1,121 @@
+"""Maintenance commands for the barber booking app.
+
+    python manage.py backup [--shop main]
+    python manage.py list-backups [--shop main]
+    python manage.py restore backups/main/main-20261019T020000000000.db [--until 2026-10-19T14:30:00]
+    python manage.py events [--after 120] [--table appointments]
+    python manage.py replay rebuilt.db [--snapshot PATH] [--until-seq 500] [--verify]
+    python manage.py feed-urls [--shop main]
+    python manage.py serve-feeds [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')  # the bare-mode import renders the UI once
+import Appointment as app  # noqa: E402
+
+
+def cmd_backup(args):
+    path = app.backup_tenant(app.use_tenant(args.shop))
+    status = app.get_tenant(args.shop).backup_status
+    print(f"{path} ({status['pages_total']} pages in {status['duration']:.2f}s)")
+
+
+def cmd_list_backups(args):
+    for path in app.list_backups(app.use_tenant(args.shop)):
+        print(path)
+
+
+def cmd_restore(args):
+    until = datetime.fromisoformat(args.until) if args.until else None
+    replayed = app.restore_backup(args.snapshot, until=until, tenant=app.use_tenant(args.shop))
+    print(f"Restored {args.snapshot}" + (f", replayed {replayed} journal events up to {args.until} UTC" if until else ""))
+
+
+def cmd_events(args):
+    app.use_tenant(args.shop)
+    tables = tuple(args.table) if args.table else None
+    for event in app.read_events(args.after, args.limit, tables):
+        print(json.dumps(event))
+
+
+def table_diffs(a_path: str, b_path: str):
+    # Tables whose rows differ between two shop databases
+    a, b = sqlite3.connect(a_path), sqlite3.connect(b_path)
+    diffs = []
+    for table in app.VERSIONED_TABLES:
+        query = f"SELECT * FROM {table} ORDER BY id"
+        if a.execute(query).fetchall() != b.execute(query).fetchall():
+            diffs.append(table)
+    a.close()
+    b.close()
+    return diffs
+
+
+def cmd_replay(args):
+    tenant = app.use_tenant(args.shop)
+    count, base = app.replay_journal(args.out, snapshot_path=args.snapshot, until_seq=args.until_seq, tenant=tenant)
+    print(f"Rebuilt {args.out} from {base} with {count} journal events")
+    if args.verify:
+        diffs = table_diffs(args.out, tenant.db_path)
+        print("Matches the live database" if not diffs else f"Differs from the live database in: {', '.join(diffs)}")
+        return 1 if diffs else 0
+
+
+def cmd_feed_urls(args):
+    tenant = app.use_tenant(args.shop)
+    print(f"shop: {app.FEED_URL}{app.feed_path(tenant=tenant)}")
+    for _, row in app.get_barbers().iterrows():
+        print(f"{row['name']}: {app.FEED_URL}{app.feed_path(row['id'], tenant)}")
+
+
+def cmd_serve_feeds(args):
+    server = app.make_feed_server(args.host, args.port)
+    print(f"Serving calendar feeds on http://{args.host}:{server.server_port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barber booking maintenance commands")
+    parser.add_argument('--shop', default=app.DEFAULT_TENANT, help="shop slug from tenants.json")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('backup', help="take an online snapshot now").set_defaults(func=cmd_backup)
+    sub.add_parser('list-backups', help="list snapshots, newest first").set_defaults(func=cmd_list_backups)
+    restore = sub.add_parser('restore', help="restore a snapshot, optionally rolling forward")
+    restore.add_argument('snapshot')
+    restore.add_argument('--until', help="replay the write journal up to this UTC time (ISO format)")
+    restore.set_defaults(func=cmd_restore)
+    events = sub.add_parser('events', help="print journal events after a sequence number as JSON lines")
+    events.add_argument('--after', type=int, default=0, help="cursor: only events with a higher seq")
+    events.add_argument('--limit', type=int, default=app.JOURNAL_READ_LIMIT)
+    events.add_argument('--table', action='append', choices=app.VERSIONED_TABLES)
+    events.set_defaults(func=cmd_events)
+    replay = sub.add_parser('replay', help="rebuild the shop into a new file by replaying the journal")
+    replay.add_argument('out')
+    replay.add_argument('--snapshot', help="start from this snapshot instead of the earliest state the journal covers")
+    replay.add_argument('--until-seq', type=int, help="stop after this journal sequence number")
+    replay.add_argument('--verify', action='store_true', help="compare the result with the live database")
+    replay.set_defaults(func=cmd_replay)
+    sub.add_parser('feed-urls', help="print the iCalendar feed URLs of a shop").set_defaults(func=cmd_feed_urls)
+    serve = sub.add_parser('serve-feeds', help="serve the iCalendar feeds of every shop over HTTP")
+    serve.add_argument('--host', default=app.FEED_HOST)
+    serve.add_argument('--port', type=int, default=app.FEED_PORT or 8765)
+    serve.set_defaults(func=cmd_serve_feeds)
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except app.JournalGap as ex:
+        parser.exit(2, f"{ex}\n")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Calendar tab regression checks, run headlessly with Streamlit's AppTest.
+
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Appointment.py')
+
+
+@pytest.fixture(autouse=True)
+def scratch_shop(tmp_path, monkeypatch):
+    # Each test gets its own barber_shop.db; the shop's pool and caches live in st.cache_resource.
+    # No background threads, which would outlive the test and open the db in the old directory.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BARBER_PREFETCH_WORKERS', '0')
+    monkeypatch.setenv('BARBER_BACKUP_INTERVAL_MIN', '0')
+    st.cache_resource.clear()
+    yield
+    st.cache_resource.clear()
+
+
+def test_next_available_books_the_slot_day():
+    AppTest.from_file(APP_PATH, default_timeout=60).run()
+    # Keep the calendar's barber off today, so the first next-available slot is on a later day
+    db = sqlite3.connect('barber_shop.db')
+    barber_id = db.execute("SELECT id FROM barbers ORDER BY name LIMIT 1").fetchone()[0]
+    db.execute("INSERT INTO barber_unavailability (id, barber_id, date, start_time, end_time, reason) "
+               "VALUES (?, ?, ?, '00:00', '23:59', 'off')", (str(uuid.uuid4()), barber_id, date.today().isoformat()))
+    db.commit()
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60).run()
+    button = next(b for b in at.button if (b.key or '').startswith('next-'))
+    slot_date, slot_time = date.fromisoformat(button.key[5:15]), f"{button.key[16:18]}:{button.key[18:20]}"
+    assert slot_date > date.today()
+
+    button.click().run()
+    at.run()  # the picker must not pull the date back on later reruns
+    assert not at.exception
+    assert at.session_state['book_date'] == slot_date
+    assert at.date_input(key='date_input_main').value == slot_date
+    assert at.session_state['chosen_time'] == slot_time
+
+    at.multiselect(key='cal_services').select("Men's Haircut (Rs 100)").run()
+    at.text_input(key='cal_name').input('Regression')
+    at.text_input(key='cal_phone').input('+2305000000')
+    next(b for b in at.button if b.label == 'Confirm Booking').click().run()
+    assert not at.error
+    assert db.execute("SELECT appt_date, start_time FROM appointments WHERE barber_id=?",
+                      (barber_id,)).fetchall() == [(slot_date.isoformat(), slot_time)]
+    db.close()
+
+
+def test_hold_covers_the_selected_service():
+    at = AppTest.from_file(APP_PATH, default_timeout=60).run()
+    button = next(b for b in at.button if (b.key or '').startswith('next-'))
+    slot_date, slot_time = button.key[5:15], f"{button.key[16:18]}:{button.key[18:20]}"
+    button.click().run()
+    assert at.session_state['chosen_time'] == slot_time
+
+    db = sqlite3.connect('barber_shop.db')
+    barber_id = db.execute("SELECT id FROM barbers ORDER BY name LIMIT 1").fetchone()[0]
+    at.multiselect(key='cal_services').select("Men's Haircut (Rs 100)").run()
+    start = datetime.strptime(slot_time, '%H:%M')
+    assert db.execute("SELECT start_time, end_time FROM slot_holds").fetchall() == [
+        (slot_time, (start + timedelta(minutes=30)).strftime('%H:%M'))]
+
+    # Someone books right after the 30 minutes; an hour-long service no longer fits
+    db.execute("INSERT INTO appointments (id, barber_id, service_id, customer_name, customer_phone, appt_date, "
+               "start_time, end_time, notes, created_at) VALUES (?, ?, '', 'Other', '+230', ?, ?, ?, '', '')",
+               (str(uuid.uuid4()), barber_id, slot_date, (start + timedelta(minutes=30)).strftime('%H:%M'),
+                (start + timedelta(minutes=60)).strftime('%H:%M')))
+    db.commit()
+    at.multiselect(key='cal_services').unselect("Men's Haircut (Rs 100)").select(
+        "Haircut + Shave + hair color/Dry (Rs 175)").run()
+    assert not at.exception
+    assert at.session_state['chosen_time'] is None
+    assert any('not free' in w.value for w in at.warning)
+    assert db.execute("SELECT COUNT(*) FROM slot_holds").fetchone()[0] == 0
+    db.close()